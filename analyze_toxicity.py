@@ -5,10 +5,60 @@ Usage: python analyze_toxicity.py USERNAME
 """
 
 import json
+import mmap
 import sys
 from pathlib import Path
+
+import numpy as np
 from detoxify import Detoxify
 
+# Above this size, mmap the file so the parser reads pages straight from
+# the page cache instead of copying the whole text into a Python bytes
+MMAP_THRESHOLD = 1_000_000
+
+
+def load_commits(commits_file: Path) -> list[str]:
+    """Parse commits.json (orjson is much faster on multi-MB commit dumps)."""
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(commits_file.read_bytes())
+
+    if commits_file.stat().st_size > MMAP_THRESHOLD:
+        with commits_file.open("rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return orjson.loads(memoryview(mm))
+            finally:
+                mm.close()
+    return orjson.loads(commits_file.read_bytes())
+
+AXES = ['toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult', 'identity_attack']
+
+# Chunked inference: one giant predict() pads every commit to the longest
+# message in the list, and BERT cost scales with padded seq-len × batch.
+# Sorting by length first keeps each chunk's padding minimal.
+BATCH_SIZE = 64
+
+
+def predict_batched(model, commits: list[str]) -> dict:
+    """Run Detoxify over commits in length-sorted chunks.
+
+    Identical messages (templated "update"-style auto-commits are common)
+    are scored once and scattered back, so the model only sees uniques.
+    Returns per-axis float32 NumPy arrays in the original commit order.
+    """
+    uniq, inverse = np.unique(np.asarray(commits, dtype=object), return_inverse=True)
+    order = sorted(range(len(uniq)), key=lambda i: len(uniq[i]))
+    uniq_scores = {axis: np.zeros(len(uniq), dtype=np.float32) for axis in AXES}
+    for start in range(0, len(order), BATCH_SIZE):
+        idxs = order[start:start + BATCH_SIZE]
+        chunk = model.predict([str(uniq[i]) for i in idxs])
+        for axis in AXES:
+            uniq_scores[axis][idxs] = np.asarray(chunk[axis], dtype=np.float32)
+    return {axis: uniq_scores[axis][inverse] for axis in AXES}
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python analyze_toxicity.py USERNAME")
@@ -23,9 +73,7 @@ def main():
         print(f"   Expected file: {commits_file}")
         sys.exit(1)
 
-    # Load commits
-    with open(commits_file) as f:
-        commits = json.load(f)
+    commits = load_commits(commits_file)
 
     if not commits:
         print(f"❌ No commits found for {username}")
@@ -35,40 +83,28 @@ def main():
     import torch
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model = Detoxify('original', device=device)
+    if device == "cpu":
+        from toxicity import quantize_model
+        model.model = quantize_model(model.model)
     print(f"Model loaded on {device}")
-    results = model.predict(commits)
+    results = predict_batched(model, commits)
 
-    # Calculate stats (handle both numpy arrays and lists)
+    # Calculate stats
     toxicity_scores = results['toxicity']
-    avg_toxicity = sum(toxicity_scores) / len(toxicity_scores)
-    max_toxicity = max(toxicity_scores)
-    max_idx = toxicity_scores.index(max_toxicity)
+    avg_toxicity = float(toxicity_scores.mean())
+    max_idx = int(toxicity_scores.argmax())
+    max_toxicity = float(toxicity_scores[max_idx])
     worst_commit = commits[max_idx]
 
-    # Find worst on each axis
-    worst_by_axis = {}
-    for axis in ['toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult', 'identity_attack']:
-        scores = results[axis]
-        max_score = max(scores)
-        idx = scores.index(max_score)
-        worst_by_axis[axis] = (float(max_score), commits[idx])
-
-    # Find the absolute worst on any axis
-    worst_overall = None
-    worst_overall_score = 0
-    worst_overall_axis = None
-    worst_overall_idx = None
-
-    for axis, (score, commit) in worst_by_axis.items():
-        if score > worst_overall_score:
-            worst_overall_score = score
-            worst_overall = commit
-            worst_overall_axis = axis
-            # Find index of this commit in the list
-            for i, c in enumerate(commits):
-                if c == commit:
-                    worst_overall_idx = i
-                    break
+    # Find the absolute worst on any axis: stack scores into a (6, N) array
+    # and take one argmax over the whole thing instead of six per-axis passes
+    S = np.stack([results[axis] for axis in AXES])
+    axis_i, commit_i = np.unravel_index(int(S.argmax()), S.shape)
+    worst_overall_axis = AXES[axis_i]
+    worst_overall_idx = int(commit_i)
+    worst_overall_score = float(S[axis_i, commit_i])
+    worst_overall = commits[worst_overall_idx]
+    worst_all_scores = S[:, worst_overall_idx]
 
     # Print results
     print(f"\n{'='*80}")
@@ -85,21 +121,14 @@ def main():
     print(f"   Score: {worst_overall_score:.3f}")
     print(f"   Message: \"{worst_overall[:100]}{'...' if len(worst_overall) > 100 else ''}\"")
 
-    if worst_overall_idx is not None:
-        print(f"\n📋 ALL TOXICITY SCORES FOR WORST COMMIT:")
-        for axis in ['toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult', 'identity_attack']:
-            score_val = results[axis][worst_overall_idx]
-            score = float(score_val) if not isinstance(score_val, float) else score_val
-            print(f"   {axis:20s}: {score:.3f}")
+    print(f"\n📋 ALL TOXICITY SCORES FOR WORST COMMIT:")
+    for axis, score in zip(AXES, worst_all_scores):
+        print(f"   {axis:20s}: {float(score):.3f}")
 
     print(f"\n{'='*80}\n")
 
     # Save worst commit data to file
-    all_scores_dict = {}
-    if worst_overall_idx is not None:
-        for axis in ['toxicity', 'severe_toxicity', 'obscene', 'threat', 'insult', 'identity_attack']:
-            score_val = results[axis][worst_overall_idx]
-            all_scores_dict[axis] = float(score_val) if not isinstance(score_val, float) else score_val
+    all_scores_dict = {axis: float(score) for axis, score in zip(AXES, worst_all_scores)}
 
     worst_commit_data = {
         "message": worst_overall,
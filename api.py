@@ -4,9 +4,12 @@ FastAPI service for GitHub scraper with optional toxicity analysis.
 Run with: uvicorn api:app --reload --port 8000
 """
 
+import asyncio
 import json
 import os
+import sqlite3
 import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
@@ -15,21 +18,54 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 
-from scraper import scrape_user
-from toxicity import analyze_toxicity
+# Alias: the /scrape route handler below is also named scrape_user and
+# would otherwise shadow this import at module scope
+from scraper import scrape_user as scrape_github_user
+from toxicity import analyze_toxicity, get_toxicity_model
+
+# orjson parses/serializes several times faster than stdlib json on the
+# large commit/profile blobs we shuttle through the DB. Optional dep —
+# fall back to stdlib if it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def json_dumps(obj) -> str:
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj)
+
 
 # Load environment
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm-load the Detoxify model once at startup.
+
+    Background toxicity tasks would otherwise pay the multi-second BERT
+    cold start on the first /scrape. The model lives in app.state for the
+    process lifetime (get_toxicity_model caches the same instance).
+    """
+    app.state.detox = get_toxicity_model()
+    yield
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="GitRanker API",
     description="Scrape GitHub user data and analyze toxicity",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Database file
-DB_FILE = Path("scrape_results.json")
+DB_FILE = Path("scrape_results.db")
 
 
 # ============================================================================
@@ -53,62 +89,138 @@ class ScrapeResponse(BaseModel):
 # Database helpers
 # ============================================================================
 
-def load_db() -> dict:
-    """Load results database."""
-    if DB_FILE.exists():
-        return json.loads(DB_FILE.read_text())
-    return {}
-
-
-def save_db(data: dict) -> None:
-    """Save results database."""
-    DB_FILE.write_text(json.dumps(data, indent=2))
+# SQLite instead of a rewritten-on-every-request JSON blob: per-row
+# upserts keep request cost O(1) in the number of cached users, and WAL
+# mode lets concurrent background toxicity tasks write without clobbering
+# each other.
+conn = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None)
+conn.execute("PRAGMA journal_mode=WAL")
+conn.execute(
+    "CREATE TABLE IF NOT EXISTS users ("
+    "username TEXT PRIMARY KEY, data TEXT NOT NULL, toxicity TEXT)"
+)
+# Partial index keeps the /stats toxicity count an index-only lookup
+# instead of a scan over every row's JSON payload
+conn.execute(
+    "CREATE INDEX IF NOT EXISTS idx_users_with_toxicity "
+    "ON users(username) WHERE toxicity IS NOT NULL"
+)
 
 
 def get_user_data(username: str) -> Optional[dict]:
     """Get cached user data from database."""
-    db = load_db()
-    return db.get(username.lower())
+    row = conn.execute(
+        "SELECT data, toxicity FROM users WHERE username = ?",
+        (username.lower(),),
+    ).fetchone()
+    if row is None:
+        return None
+    data = json_loads(row[0])
+    if row[1]:
+        data["toxicity"] = json_loads(row[1])
+    return data
 
 
 def save_user_data(username: str, data: dict) -> None:
-    """Save user data to database."""
-    db = load_db()
-    db[username.lower()] = data
-    save_db(db)
+    """Save user data to database (preserves any existing toxicity)."""
+    conn.execute(
+        "INSERT INTO users (username, data) VALUES (?, ?) "
+        "ON CONFLICT(username) DO UPDATE SET data = excluded.data",
+        (username.lower(), json_dumps(data)),
+    )
+
+
+def user_exists(username: str) -> bool:
+    """Cheap existence check — no JSON parse of the cached row."""
+    row = conn.execute(
+        "SELECT 1 FROM users WHERE username = ?", (username.lower(),)
+    ).fetchone()
+    return row is not None
+
+
+def save_user_toxicity(username: str, toxicity: dict) -> None:
+    """Attach toxicity scores to an already-scraped user."""
+    conn.execute(
+        "UPDATE users SET toxicity = ? WHERE username = ?",
+        (json_dumps(toxicity), username.lower()),
+    )
 
 
 # ============================================================================
 # Toxicity analysis (background task)
 # ============================================================================
 
-def analyze_user_toxicity(username: str) -> dict:
-    """Analyze toxicity for a user (background task)."""
+async def analyze_user_toxicity(username: str) -> dict:
+    """Analyze toxicity for a user (async background task).
+
+    The commits read and the CPU/GPU-heavy predict both run via
+    asyncio.to_thread so concurrent /scrape calls don't stall the event
+    loop behind blocking I/O or a BERT forward pass.
+    """
     try:
         commits_file = Path(f"raw_data/{username}/commits.json")
         if not commits_file.exists():
             return {"error": "No commits found"}
 
-        with open(commits_file) as f:
-            commits = json.load(f)
+        commits = json_loads(await asyncio.to_thread(commits_file.read_bytes))
 
         if not commits:
             return {"error": "No commits to analyze"}
 
-        # Analyze
-        toxicity_scores = analyze_toxicity(commits)
+        # Analyze off-loop
+        toxicity_scores = await asyncio.to_thread(analyze_toxicity, commits)
 
-        # Update database
-        db = load_db()
-        if username.lower() in db:
-            db[username.lower()]["toxicity"] = toxicity_scores
-            save_db(db)
+        # Update database (targeted column update — no full-db rewrite)
+        save_user_toxicity(username, toxicity_scores)
 
         return toxicity_scores
     except Exception as e:
         return {"error": str(e)}
 
 
+def analyze_batch_toxicity(usernames: list[str]) -> None:
+    """Analyze toxicity for many users in one model pass (background task).
+
+    Concatenates every user's commits into one prediction pass so the model
+    runs per batch instead of per user (tiny per-user batches are the worst
+    case for GPU utilization), then slices the scores back out per user.
+    _predict_deduped adds dedup, the on-disk score cache, and length-sorted
+    chunking, so one giant commit can't blow up a single padded forward.
+    """
+    from toxicity import _predict_deduped
+
+    axes = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
+
+    all_commits: list[str] = []
+    spans: list[tuple[str, int, int]] = []  # (username, start, end)
+    for username in usernames:
+        commits_file = Path(f"raw_data/{username}/commits.json")
+        if not commits_file.exists():
+            continue
+        try:
+            commits = json_loads(commits_file.read_bytes())
+        except (ValueError, OSError):
+            continue
+        if not commits:
+            continue
+        spans.append((username, len(all_commits), len(all_commits) + len(commits)))
+        all_commits.extend(commits)
+
+    if not all_commits:
+        return
+
+    try:
+        model = get_toxicity_model()
+        results = _predict_deduped(model, all_commits)
+    except Exception as e:
+        print(f"    Batch toxicity analysis failed: {e}")
+        return
+
+    for username, start, end in spans:
+        scores = {axis: float(results[axis][start:end].mean()) for axis in axes}
+        save_user_toxicity(username, scores)
+
+
 # ============================================================================
 # API Endpoints
 # ============================================================================
@@ -143,7 +255,7 @@ async def scrape_user(request: ScrapeRequest, background_tasks: BackgroundTasks)
     try:
         # Scrape user
         print(f"Scraping {username}...")
-        result = scrape_user(username)
+        result = scrape_github_user(username)
 
         if result is None:
             return ScrapeResponse(
@@ -200,13 +312,12 @@ async def run_toxicity(username: str):
     """Manually run toxicity analysis for a user."""
     username = username.strip()
 
-    # Check if user was scraped
-    data = get_user_data(username)
-    if not data:
+    # Check if user was scraped (existence only — skip the row parse)
+    if not user_exists(username):
         raise HTTPException(status_code=404, detail=f"User '{username}' not found. Scrape them first.")
 
     try:
-        toxicity_scores = analyze_user_toxicity(username)
+        toxicity_scores = await analyze_user_toxicity(username)
         return {
             "username": username,
             "status": "success",
@@ -223,16 +334,18 @@ async def run_toxicity(username: str):
 @app.get("/stats")
 async def get_stats():
     """Get scraping statistics."""
-    db = load_db()
-
-    users_with_toxicity = sum(1 for u in db.values() if u.get("toxicity"))
+    total = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    users_with_toxicity = conn.execute(
+        "SELECT COUNT(*) FROM users WHERE toxicity IS NOT NULL"
+    ).fetchone()[0]
+    users = [row[0] for row in conn.execute("SELECT username FROM users")]
 
     return {
-        "total_users_scraped": len(db),
+        "total_users_scraped": total,
         "users_with_toxicity_analysis": users_with_toxicity,
         "database_file": str(DB_FILE),
         "raw_data_dir": "raw_data/",
-        "users": list(db.keys())
+        "users": users
     }
 
 
@@ -240,14 +353,11 @@ async def get_stats():
 async def delete_user(username: str):
     """Delete a user from the cache."""
     username = username.strip()
-    db = load_db()
+    cur = conn.execute("DELETE FROM users WHERE username = ?", (username.lower(),))
 
-    if username.lower() not in db:
+    if cur.rowcount == 0:
         raise HTTPException(status_code=404, detail=f"User '{username}' not found")
 
-    del db[username.lower()]
-    save_db(db)
-
     return {"status": "deleted", "username": username}
 
 
@@ -264,20 +374,18 @@ async def scrape_batch(usernames: list[str], analyze_toxicity: bool = False, bac
     - **analyze_toxicity**: If true, run toxicity analysis for all users
     """
     results = []
+    scraped = []
 
     for username in usernames:
         try:
-            result = scrape_user(username)
+            result = scrape_github_user(username)
             if result:
                 save_user_data(username, result)
+                scraped.append(username)
                 results.append({
                     "username": username,
                     "status": "success"
                 })
-
-                # Schedule toxicity if requested
-                if analyze_toxicity and background_tasks:
-                    background_tasks.add_task(analyze_user_toxicity, username)
             else:
                 results.append({
                     "username": username,
@@ -290,6 +398,10 @@ async def scrape_batch(usernames: list[str], analyze_toxicity: bool = False, bac
                 "error": str(e)
             })
 
+    # One batched toxicity task for the whole request instead of N tiny ones
+    if analyze_toxicity and background_tasks and scraped:
+        background_tasks.add_task(analyze_batch_toxicity, scraped)
+
     return {
         "total": len(usernames),
         "results": results
@@ -11,8 +11,32 @@ Usage:
 
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
+
+# orjson is several times faster than stdlib json for the multi-MB
+# precomputed/judge/readme blobs this script chews through. Optional dep —
+# fall back to stdlib if it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+# ijson lets us stream huge readmes.json files key-by-key instead of
+# materializing megabytes of README text to use ~one value. Optional dep.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # ---------------------------------------------------------------------------
 # Paths
 # ---------------------------------------------------------------------------
@@ -56,6 +80,11 @@ CURVE_THRESHOLDS = [
     (100, "A"),
 ]
 
+# Split thresholds once for vectorized lookup (searchsorted needs the
+# cutoffs as a sorted array).
+CURVE_CUTOFFS = np.array([c for c, _ in CURVE_THRESHOLDS])
+CURVE_GRADES = [g for _, g in CURVE_THRESHOLDS]
+
 
 def curve_grades(judge_results: dict) -> dict:
     """Apply a standard bell curve to CodeRabbit grades.
@@ -81,19 +110,14 @@ def curve_grades(judge_results: dict) -> dict:
     n = len(graded)
     curved = dict(judge_results)  # shallow copy
 
-    for rank, (username, _orig_numeric) in enumerate(graded):
-        # Percentile: 0 = worst, 100 = best
-        percentile = (rank / max(n - 1, 1)) * 100
-
-        # Find the curved grade for this percentile
-        new_grade = "A+"
-        for cutoff, grade in CURVE_THRESHOLDS:
-            if percentile <= cutoff:
-                new_grade = grade
-                break
+    # Percentile per rank (0 = worst, 100 = best), then one searchsorted
+    # for all users instead of a 12-way Python scan each
+    percentiles = np.arange(n) / max(n - 1, 1) * 100
+    grade_idx = np.searchsorted(CURVE_CUTOFFS, percentiles)
 
+    for (username, _orig_numeric), i in zip(graded, grade_idx):
         curved[username] = dict(curved[username])
-        curved[username]["quality_grade"] = new_grade
+        curved[username]["quality_grade"] = CURVE_GRADES[min(int(i), len(CURVE_GRADES) - 1)]
 
     return curved
 
@@ -108,10 +132,18 @@ def parse_roles() -> dict[str, str]:
         judge:username   → role = "judge"
         org:username     → role = "organizer"
         username         → role = "participant"
+
+    Memoized on the file's mtime — repeat calls (e.g. export invoked from
+    a server loop) skip the re-read unless the file changed.
     """
-    roles: dict[str, str] = {}
     if not USERNAMES_FILE.exists():
-        return roles
+        return {}
+    return _parse_roles_cached(USERNAMES_FILE.stat().st_mtime)
+
+
+@lru_cache(maxsize=1)
+def _parse_roles_cached(_mtime: float) -> dict[str, str]:
+    roles: dict[str, str] = {}
 
     for line in USERNAMES_FILE.read_text().splitlines():
         line = line.strip()
@@ -135,20 +167,18 @@ def parse_roles() -> dict[str, str]:
 # ---------------------------------------------------------------------------
 def compute_sus_percentiles(users: dict) -> dict[str, int]:
     """Rank users by emoji_score and assign 0-100 percentile."""
-    scores = []
-    for username, data in users.items():
-        scores.append((username, data.get("emoji_score", 0)))
-
-    # Sort by emoji score ascending
-    scores.sort(key=lambda x: x[1])
+    usernames = list(users)
+    n = len(usernames)
+    if n == 0:
+        return {}
 
-    n = len(scores)
-    percentiles = {}
-    for rank, (username, _score) in enumerate(scores):
-        # Percentile: what fraction of users have a lower score
-        percentiles[username] = int((rank / max(n - 1, 1)) * 100)
+    # Rank with a stable argsort and compute all percentiles in one
+    # integer-vector op instead of a Python sort + division loop
+    scores = np.array([users[u].get("emoji_score", 0) for u in usernames])
+    order = np.argsort(scores, kind="stable")
+    percentiles = np.arange(n) * 100 // max(n - 1, 1)
 
-    return percentiles
+    return {usernames[i]: int(p) for i, p in zip(order, percentiles)}
 
 
 # ---------------------------------------------------------------------------
@@ -156,19 +186,48 @@ def compute_sus_percentiles(users: dict) -> dict[str, int]:
 # ---------------------------------------------------------------------------
 BADGE_IMG_RE = re.compile(r"!\[.*?\]\(")
 
+# Single compiled, case-insensitive scan for "test"/"ci" mentions —
+# replaces two substring passes over a readme.lower() copy.
+TEST_CI_RE = re.compile(r"test|ci", re.IGNORECASE)
 
-def compute_badges(username: str, top_repo_name: str | None) -> list[str]:
-    """Compute heuristic badges from README content."""
-    badges = []
-    readme_file = RAW_DATA_DIR / username / "readmes.json"
 
-    if not readme_file.exists():
-        badges.append("Empty README Enthusiast")
-        return badges
+# Below this size a plain parse is cheaper than setting up a stream
+READMES_STREAM_THRESHOLD = 64_000
+
 
+def load_readmes(username: str, top_repo_name: str | None = None) -> dict[str, str] | None:
+    """Read raw_data/<user>/readmes.json. Returns None if missing/unparseable.
+
+    Large files are stream-parsed with ijson, keeping only the entries
+    compute_badges actually looks at: the top repo's README and the longest
+    one (its fallback).
+    """
+    readme_file = RAW_DATA_DIR / username / "readmes.json"
+    if not readme_file.exists():
+        return None
     try:
-        readmes: dict[str, str] = json.loads(readme_file.read_text())
-    except (json.JSONDecodeError, OSError):
+        if ijson and readme_file.stat().st_size > READMES_STREAM_THRESHOLD:
+            reduced: dict[str, str] = {}
+            longest_key, longest_val = None, ""
+            with open(readme_file, "rb") as f:
+                for key, val in ijson.kvitems(f, ""):
+                    if key == top_repo_name:
+                        reduced[key] = val
+                    if isinstance(val, str) and len(val) > len(longest_val):
+                        longest_key, longest_val = key, val
+            if longest_key is not None:
+                reduced.setdefault(longest_key, longest_val)
+            return reduced
+        return json_loads(readme_file.read_bytes())
+    except (ValueError, OSError):
+        return None
+
+
+def compute_badges(readmes: dict[str, str] | None, top_repo_name: str | None) -> list[str]:
+    """Compute heuristic badges from pre-loaded README content."""
+    badges = []
+
+    if readmes is None:
         badges.append("Empty README Enthusiast")
         return badges
 
@@ -197,8 +256,7 @@ def compute_badges(username: str, top_repo_name: str | None) -> list[str]:
         badges.append("Badges Hoarder")
 
     # No Tests, No Problem: README never mentions "test" or "ci"
-    readme_lower = readme.lower()
-    if "test" not in readme_lower and "ci" not in readme_lower:
+    if TEST_CI_RE.search(readme) is None:
         badges.append("No Tests, No Problem")
 
     return badges
@@ -227,13 +285,24 @@ def clean_verdict(verdict: str) -> str:
 # ---------------------------------------------------------------------------
 def load_judge_results() -> dict[str, dict]:
     """Load CodeRabbit judge results. Tries judge_results.json first,
-    then falls back to extracting from judge_state.json."""
+    then falls back to extracting from judge_state.json.
+
+    Memoized on both files' mtimes so repeat invocations skip the
+    disk + parse work.
+    """
+    results_key = JUDGE_RESULTS_FILE.stat().st_mtime if JUDGE_RESULTS_FILE.exists() else None
+    state_key = JUDGE_STATE_FILE.stat().st_mtime if JUDGE_STATE_FILE.exists() else None
+    return _load_judge_results_cached(results_key, state_key)
+
+
+@lru_cache(maxsize=1)
+def _load_judge_results_cached(_results_mtime: float | None, _state_mtime: float | None) -> dict[str, dict]:
     if JUDGE_RESULTS_FILE.exists():
-        return json.loads(JUDGE_RESULTS_FILE.read_text())
+        return json_loads(JUDGE_RESULTS_FILE.read_bytes())
 
     # Fallback: extract from judge_state.json
     if JUDGE_STATE_FILE.exists():
-        state = json.loads(JUDGE_STATE_FILE.read_text())
+        state = json_loads(JUDGE_STATE_FILE.read_bytes())
         results = {}
         for username, user_state in state.items():
             if "result" in user_state:
@@ -253,12 +322,24 @@ def main() -> None:
         print(f"ERROR: {PRECOMPUTED_FILE} not found. Run precompute.py first.")
         return
 
-    precomputed: dict = json.loads(PRECOMPUTED_FILE.read_text())
+    precomputed: dict = json_loads(PRECOMPUTED_FILE.read_bytes())
     judge_results_raw = load_judge_results()
     judge_results = curve_grades(judge_results_raw)
     roles = parse_roles()
     sus_percentiles = compute_sus_percentiles(precomputed)
 
+    # README loads are pure disk I/O — fan them out across threads and keep
+    # the (cheap) badge heuristics synchronous on the results.
+    top_repo_by_user = {
+        username: (data.get("top_repos") or [None])[0]
+        for username, data in precomputed.items()
+    }
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        all_readmes = dict(zip(precomputed, pool.map(
+            lambda username: load_readmes(username, top_repo_by_user[username]),
+            precomputed,
+        )))
+
     graded_count = sum(
         1 for r in judge_results_raw.values()
         if GRADE_ORDER.get(r.get("quality_grade", "Pending")) is not None
@@ -276,7 +357,7 @@ def main() -> None:
         jr = judge_results.get(username, {})
 
         # Badges from README heuristics
-        badges = compute_badges(username, top_repo_name)
+        badges = compute_badges(all_readmes.get(username), top_repo_name)
 
         entry = {
             "username": username,
@@ -307,7 +388,10 @@ def main() -> None:
 
     # Write output
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    OUTPUT_FILE.write_text(json.dumps(output, indent=2))
+    if orjson:
+        OUTPUT_FILE.write_bytes(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+    else:
+        OUTPUT_FILE.write_text(json.dumps(output, indent=2))
 
     graded = sum(1 for e in output if e["quality_grade"] not in ("Pending", "Error"))
     print(f"\nExported {len(output)} users to {OUTPUT_FILE}")
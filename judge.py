@@ -23,30 +23,53 @@ Usage:
 """
 
 import argparse
+import atexit
 import json
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
+# C-accelerated serialization for the hot state/cache writes; stdlib json
+# keeps working if orjson isn't installed. Human-read files
+# (judge_results.json, coderabbit_report.json) stay pretty-printed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj) -> str:
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj)
+
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
 GITHUB_API = "https://api.github.com"
 CODERABBIT_API = "https://api.coderabbit.ai/api/v1"
 PRECOMPUTED_FILE = Path("precomputed.json")
-STATE_FILE = Path("judge_state.json")
+STATE_FILE = Path("judge_state.jsonl")
+LEGACY_STATE_FILE = Path("judge_state.json")
 RESULTS_FILE = Path("judge_results.json")
 ORPHAN_BRANCH = "wall-of-shame-baseline"
-POLL_INTERVAL = 30  # seconds between polls
+# Adaptive polling: start tight so fast CodeRabbit replies are caught
+# quickly, back off while nothing arrives, snap back once responses flow
+POLL_INTERVAL_MIN = 5    # seconds
+POLL_INTERVAL_MAX = 60   # seconds
+POLL_BACKOFF = 1.5       # growth factor per empty poll round
 POLL_TIMEOUT = 600  # 10 minutes max wait per PR
+MAX_WORKERS = 8     # concurrent GitHub calls per phase (network-bound)
 
 # ---------------------------------------------------------------------------
 # Auth — use a single ADMIN token for all write operations (fork/PR/comment)
@@ -101,19 +124,168 @@ GITHUB_HEADERS = {
     "Accept": "application/vnd.github+json",
 }
 
+# One keep-alive session for the whole run — a fresh TLS handshake to
+# api.github.com per call costs more than the API work itself. Retries on
+# flaky/throttled statuses live in the adapter (honors Retry-After).
+SESSION = requests.Session()
+SESSION.headers.update(GITHUB_HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=2,
+        status_forcelist=[429, 502, 503],
+        allowed_methods=None,  # phases retry POSTs too, as the old loop did
+        respect_retry_after_header=True,
+    ),
+))
+
+# ---------------------------------------------------------------------------
+# ETag cache — conditional GETs return a 304 that costs zero rate-limit
+# quota, so pipeline re-runs don't burn the hourly budget re-fetching
+# repos/commits/comments that haven't changed.
+# ---------------------------------------------------------------------------
+ETAG_CACHE_FILE = Path(".gh_etag_cache.json")
+# The cache stores full response bodies, so serializing it on every 200
+# would be an O(N²) full-file rewrite on the hot request path (the same
+# pattern the JSONL state log exists to avoid). Batch flushes instead:
+# every ETAG_FLUSH_EVERY updates plus once at exit. Losing the tail on a
+# hard kill only costs a few re-fetches next run.
+ETAG_FLUSH_EVERY = 50
+_etag_lock = threading.Lock()
+_etag_dirty = 0
+try:
+    _etag_cache: dict = json.loads(ETAG_CACHE_FILE.read_text()) if ETAG_CACHE_FILE.exists() else {}
+except (json.JSONDecodeError, OSError):
+    _etag_cache = {}
+
+
+def _flush_etag_cache() -> None:
+    global _etag_dirty
+    with _etag_lock:
+        if not _etag_dirty:
+            return
+        snapshot = json_dumps(_etag_cache)
+        _etag_dirty = 0
+    try:
+        ETAG_CACHE_FILE.write_text(snapshot)
+    except OSError:
+        pass
+
+
+atexit.register(_flush_etag_cache)
+
+
+# ---------------------------------------------------------------------------
+# Proactive rate-limit tracking — GitHub 403s with X-RateLimit-Remaining: 0
+# well before hard-capping, and the retry adapter doesn't treat that as
+# retryable. Track the headers on every response and stall before burning
+# the last of the quota.
+# ---------------------------------------------------------------------------
+RATE_LIMIT_BUFFER = 50
+_rate_lock = threading.Lock()
+_rate_remaining: int | None = None
+_rate_reset: float = 0.0
+
+
+def _record_rate_limit(resp) -> None:
+    global _rate_remaining, _rate_reset
+    remaining = resp.headers.get("X-RateLimit-Remaining")
+    reset_at = resp.headers.get("X-RateLimit-Reset")
+    if remaining is not None:
+        with _rate_lock:
+            _rate_remaining = int(remaining)
+            if reset_at is not None:
+                _rate_reset = float(reset_at)
+
 
-def gh(method: str, path: str, retries: int = 3, **kwargs) -> requests.Response:
-    """Make a GitHub REST API call with retries using the ADMIN token."""
+def _wait_for_rate_limit() -> None:
+    with _rate_lock:
+        remaining, reset = _rate_remaining, _rate_reset
+    if remaining is not None and remaining < RATE_LIMIT_BUFFER:
+        wait = max(0.0, reset - time.time()) + 1
+        if wait > 1:
+            print(f"  Rate-limit buffer hit ({remaining} left); sleeping {wait:.0f}s until reset…")
+        time.sleep(wait)
+
+
+class CachedResponse:
+    """Minimal requests.Response stand-in replayed from the ETag cache."""
+
+    def __init__(self, status_code: int, body, headers: dict):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = ""
+        self._body = body
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        pass
+
+
+def _etag_key(url: str, params: dict | None) -> str:
+    if params:
+        return url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+    return url
+
+
+def gh(method: str, path: str, **kwargs):
+    """Make a GitHub REST API call via the pooled session (ADMIN token).
+
+    Retries/backoff are handled by the session adapter. GETs send
+    If-None-Match from the on-disk ETag cache; a 304 is served from the
+    cache without counting against the rate limit.
+    """
     url = f"{GITHUB_API}{path}" if path.startswith("/") else path
-    for attempt in range(retries):
-        resp = requests.request(method, url, headers=GITHUB_HEADERS, timeout=30, **kwargs)
-        if resp.status_code in (502, 503, 429):
-            wait = 2 ** attempt
-            print(f"  GitHub {resp.status_code}, retry in {wait}s…")
-            time.sleep(wait)
-            continue
-        return resp
-    return resp  # return last attempt even if failed
+    is_get = method.upper() == "GET"
+    cache_key = _etag_key(url, kwargs.get("params")) if is_get else None
+
+    cached = None
+    if is_get:
+        with _etag_lock:
+            cached = _etag_cache.get(cache_key)
+        if cached:
+            kwargs.setdefault("headers", {})["If-None-Match"] = cached["etag"]
+
+    _wait_for_rate_limit()
+    resp = SESSION.request(method, url, timeout=30, **kwargs)
+    _record_rate_limit(resp)
+
+    # Secondary rate limit / quota exhaustion comes back as 403 — wait out
+    # the reset and retry once instead of treating it as fatal
+    if resp.status_code == 403 and resp.headers.get("X-RateLimit-Remaining") == "0":
+        wait = max(0.0, _rate_reset - time.time()) + 1
+        print(f"  403 rate-limited; sleeping {wait:.0f}s until reset…")
+        time.sleep(wait)
+        resp = SESSION.request(method, url, timeout=30, **kwargs)
+        _record_rate_limit(resp)
+
+    if is_get:
+        if resp.status_code == 304 and cached:
+            return CachedResponse(cached["status"], cached["body"], cached["headers"])
+        etag = resp.headers.get("ETag")
+        if etag and resp.status_code == 200:
+            try:
+                body = resp.json()
+            except ValueError:
+                body = None
+            if body is not None:
+                global _etag_dirty
+                with _etag_lock:
+                    _etag_cache[cache_key] = {
+                        "etag": etag,
+                        "status": 200,
+                        "body": body,
+                        "headers": {"Link": resp.headers.get("Link", "")},
+                    }
+                    _etag_dirty += 1
+                    flush = _etag_dirty >= ETAG_FLUSH_EVERY
+                if flush:
+                    _flush_etag_cache()
+    return resp
 
 
 def get_auth_user() -> str:
@@ -125,15 +297,40 @@ def get_auth_user() -> str:
 
 # ---------------------------------------------------------------------------
 # State management (resumable pipeline)
+#
+# Append-only JSONL: each user update appends one {"u": user, ...} record
+# instead of rewriting the whole state file (O(N) bytes per single-user
+# change, O(N²) over a run). load_state replays the log in order;
+# save_state compacts it back to one record per user at phase boundaries.
 # ---------------------------------------------------------------------------
 def load_state() -> dict:
+    state: dict = {}
     if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text())
-    return {}
+        for line in STATE_FILE.read_text().splitlines():
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            state.setdefault(rec["u"], {}).update(
+                {k: v for k, v in rec.items() if k != "u"}
+            )
+        return state
+    # Migrate a pre-JSONL state file from older runs
+    if LEGACY_STATE_FILE.exists():
+        return json.loads(LEGACY_STATE_FILE.read_text())
+    return state
+
+
+def save_delta(username: str, patch: dict) -> None:
+    """Append one user's state change to the log."""
+    with STATE_FILE.open("a") as f:
+        f.write(json_dumps({"u": username, **patch}) + "\n")
 
 
 def save_state(state: dict) -> None:
-    STATE_FILE.write_text(json.dumps(state, indent=2))
+    """Compact the log to one record per user (run at phase boundaries)."""
+    STATE_FILE.write_text(
+        "".join(json_dumps({"u": u, **rec}) + "\n" for u, rec in state.items())
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -161,12 +358,13 @@ def fork_repo(owner: str, repo: str, auth_user: str) -> str | None:
 
 
 def phase_fork(precomputed: dict, state: dict) -> dict:
-    """Fork all HVT top repos."""
+    """Fork all HVT top repos (MAX_WORKERS forks in flight at once)."""
     auth_user = get_auth_user()
     print(f"\n{'='*60}")
     print(f"PHASE 1: FORKING REPOS (as {auth_user})")
     print(f"{'='*60}")
 
+    todo = []
     for username, data in precomputed.items():
         user_state = state.get(username, {})
         if user_state.get("fork_name"):
@@ -177,71 +375,159 @@ def phase_fork(precomputed: dict, state: dict) -> dict:
             print(f"  [{username}] No repos — skipping")
             continue
 
-        repo_name = top_repos[0]
-        print(f"  [{username}] Forking {username}/{repo_name}…", end=" ", flush=True)
-
-        fork_name = fork_repo(username, repo_name, auth_user)
-        if fork_name:
-            print(f"→ {fork_name}")
-            state.setdefault(username, {})["fork_name"] = fork_name
-            state[username]["repo_name"] = repo_name
-        else:
-            print("FAILED")
-            state.setdefault(username, {})["error"] = "fork_failed"
-
-        save_state(state)
-        time.sleep(2)  # Be nice — forks are expensive operations
-
+        todo.append((username, top_repos[0]))
+
+    # The phase is pure network latency — fan the fork calls out across a
+    # thread pool. State is only mutated here on the main thread as
+    # futures complete; each completion appends one tiny delta record.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(fork_repo, username, repo_name, auth_user): (username, repo_name)
+            for username, repo_name in todo
+        }
+        for future in as_completed(futures):
+            username, repo_name = futures[future]
+            fork_name = future.result()
+            if fork_name:
+                print(f"  [{username}] {username}/{repo_name} → {fork_name}")
+                state.setdefault(username, {})["fork_name"] = fork_name
+                state[username]["repo_name"] = repo_name
+                save_delta(username, {"fork_name": fork_name, "repo_name": repo_name})
+            else:
+                print(f"  [{username}] {username}/{repo_name} FAILED")
+                state.setdefault(username, {})["error"] = "fork_failed"
+                save_delta(username, {"error": "fork_failed"})
+
+    save_state(state)
     return state
 
 
 # ---------------------------------------------------------------------------
 # Phase 2: Create orphan branches + PRs
 # ---------------------------------------------------------------------------
+HEAD_COMMIT_QUERY = """
+query($owner: String!, $name: String!, $branch: String!) {
+  repository(owner: $owner, name: $name) {
+    ref(qualifiedName: $branch) {
+      target {
+        ... on Commit {
+          oid
+          history(first: 1) { totalCount }
+        }
+      }
+    }
+  }
+}
+"""
+
+OLDEST_COMMIT_QUERY = """
+query($owner: String!, $name: String!, $branch: String!, $cursor: String!) {
+  repository(owner: $owner, name: $name) {
+    ref(qualifiedName: $branch) {
+      target {
+        ... on Commit {
+          history(first: 1, after: $cursor) {
+            nodes { oid }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def gh_graphql(query: str, variables: dict) -> dict | None:
+    """Run a GraphQL query with the ADMIN token. Returns data or None."""
+    resp = gh("POST", "/graphql", json={"query": query, "variables": variables})
+    if resp.status_code != 200:
+        return None
+    data = resp.json()
+    if "errors" in data:
+        return None
+    return data.get("data")
+
+
+def find_oldest_sha(fork_name: str, default_branch: str) -> str | None:
+    """Find the root commit SHA via GraphQL in at most 2 requests.
+
+    History cursors are "<head-oid> <offset>", so after reading the head
+    commit and totalCount we can jump straight to the last history node —
+    no walking the REST Link pagination to page N.
+    """
+    owner, name = fork_name.split("/")
+    variables = {"owner": owner, "name": name, "branch": default_branch}
+
+    data = gh_graphql(HEAD_COMMIT_QUERY, variables)
+    try:
+        target = data["repository"]["ref"]["target"]
+        head_oid = target["oid"]
+        total = target["history"]["totalCount"]
+    except (KeyError, TypeError):
+        return None
+
+    if total == 1:
+        return head_oid
+
+    data = gh_graphql(OLDEST_COMMIT_QUERY, {**variables, "cursor": f"{head_oid} {total - 2}"})
+    try:
+        return data["repository"]["ref"]["target"]["history"]["nodes"][0]["oid"]
+    except (KeyError, TypeError, IndexError):
+        return None
+
+
+LINK_LAST_RE = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+
 def create_base_branch(fork_name: str, default_branch: str) -> str | None:
     """Create a branch from the repo's oldest reachable commit.
 
     This ensures common history with the default branch so GitHub allows
     a PR between them. The diff will show ~all code as additions.
     """
-    # Get the oldest commit by fetching the last page of commits
-    resp = gh("GET", f"/repos/{fork_name}/commits",
-              params={"sha": default_branch, "per_page": 1})
-    if resp.status_code != 200:
-        print(f"  Failed to list commits: {resp.status_code}")
-        return None
-
-    # Follow the 'last' link to find the initial commit
-    link_header = resp.headers.get("Link", "")
-    oldest_sha = None
-
-    if "last" in link_header:
-        # Extract last page URL
-        import re as _re
-        last_match = _re.search(r'<([^>]+)>;\s*rel="last"', link_header)
-        if last_match:
-            last_resp = gh("GET", last_match.group(1))
-            if last_resp.status_code == 200 and last_resp.json():
-                oldest_sha = last_resp.json()[-1]["sha"]
+    oldest_sha = find_oldest_sha(fork_name, default_branch)
 
     if not oldest_sha:
-        # Small repo — the first request already has the only commit(s)
-        commits = resp.json()
-        if commits:
-            oldest_sha = commits[-1]["sha"]
+        # Fallback: REST pagination — fetch the last page of commits
+        resp = gh("GET", f"/repos/{fork_name}/commits",
+                  params={"sha": default_branch, "per_page": 1})
+        if resp.status_code != 200:
+            print(f"  Failed to list commits: {resp.status_code}")
+            return None
+
+        # Follow the 'last' link to find the initial commit
+        link_header = resp.headers.get("Link", "")
+
+        if "last" in link_header:
+            # Extract last page URL
+            last_match = LINK_LAST_RE.search(link_header)
+            if last_match:
+                last_resp = gh("GET", last_match.group(1))
+                if last_resp.status_code == 200 and last_resp.json():
+                    oldest_sha = last_resp.json()[-1]["sha"]
+
+        if not oldest_sha:
+            # Small repo — the first request already has the only commit(s)
+            commits = resp.json()
+            if commits:
+                oldest_sha = commits[-1]["sha"]
 
     if not oldest_sha:
         print(f"  No commits found")
         return None
 
-    # Create or update branch pointing to the oldest commit
-    resp = gh("POST", f"/repos/{fork_name}/git/refs", json={
-        "ref": f"refs/heads/{ORPHAN_BRANCH}",
-        "sha": oldest_sha,
-    })
-    if resp.status_code == 422:
-        resp = gh("PATCH", f"/repos/{fork_name}/git/refs/heads/{ORPHAN_BRANCH}",
-                  json={"sha": oldest_sha, "force": True})
+    # Create or update branch pointing to the oldest commit. PATCH with
+    # force is idempotent and succeeds in one round-trip on resumed runs
+    # (the common case). A missing ref comes back as 422 "Reference does
+    # not exist" from this endpoint (404 covers repo-level misses) — both
+    # mean the ref needs creating.
+    resp = gh("PATCH", f"/repos/{fork_name}/git/refs/heads/{ORPHAN_BRANCH}",
+              json={"sha": oldest_sha, "force": True})
+    if resp.status_code in (404, 422):
+        resp = gh("POST", f"/repos/{fork_name}/git/refs", json={
+            "ref": f"refs/heads/{ORPHAN_BRANCH}",
+            "sha": oldest_sha,
+        })
     if resp.status_code not in (200, 201):
         print(f"  Failed to create branch: {resp.status_code} {resp.text[:200]}")
         return None
@@ -282,12 +568,34 @@ def create_pr(fork_name: str, default_branch: str) -> int | None:
     return None
 
 
+def setup_pr(fork_name: str) -> tuple[int | None, str | None, str]:
+    """Branch-and-PR setup for one fork. Returns (pr_number, default_branch, note)."""
+    # Get default branch
+    resp = gh("GET", f"/repos/{fork_name}")
+    if resp.status_code != 200:
+        return None, None, f"Fork not ready yet ({resp.status_code})"
+    default_branch = resp.json()["default_branch"]
+
+    # Create base branch from oldest commit
+    sha = create_base_branch(fork_name, default_branch)
+    if not sha:
+        return None, None, "orphan branch failed"
+
+    # Create PR
+    pr_num = create_pr(fork_name, default_branch)
+    if not pr_num:
+        return None, None, "PR failed"
+
+    return pr_num, default_branch, f"PR #{pr_num}"
+
+
 def phase_pr(precomputed: dict, state: dict) -> dict:
-    """Create orphan branches and PRs for all forked repos."""
+    """Create orphan branches and PRs for all forked repos (concurrently)."""
     print(f"\n{'='*60}")
     print(f"PHASE 2: CREATING PRS")
     print(f"{'='*60}")
 
+    todo = []
     for username in precomputed:
         user_state = state.get(username, {})
         fork_name = user_state.get("fork_name")
@@ -295,109 +603,140 @@ def phase_pr(precomputed: dict, state: dict) -> dict:
             continue
         if user_state.get("pr_number"):
             continue
-
-        print(f"  [{username}] {fork_name}…", end=" ", flush=True)
-
-        # Get default branch
-        resp = gh("GET", f"/repos/{fork_name}")
-        if resp.status_code != 200:
-            print(f"Fork not ready yet ({resp.status_code})")
-            continue
-        default_branch = resp.json()["default_branch"]
-
-        # Create base branch from oldest commit
-        sha = create_base_branch(fork_name, default_branch)
-        if not sha:
-            print("orphan branch failed")
-            continue
-
-        # Create PR
-        pr_num = create_pr(fork_name, default_branch)
-        if pr_num:
-            print(f"PR #{pr_num}")
-            state[username]["pr_number"] = pr_num
-            state[username]["default_branch"] = default_branch
-        else:
-            print("PR failed")
-
-        save_state(state)
-        time.sleep(1)
-
+        todo.append((username, fork_name))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(setup_pr, fork_name): (username, fork_name)
+            for username, fork_name in todo
+        }
+        for future in as_completed(futures):
+            username, fork_name = futures[future]
+            pr_num, default_branch, note = future.result()
+            print(f"  [{username}] {fork_name}… {note}")
+            if pr_num:
+                state[username]["pr_number"] = pr_num
+                state[username]["default_branch"] = default_branch
+                save_delta(username, {"pr_number": pr_num, "default_branch": default_branch})
+
+    save_state(state)
     return state
 
 
 # ---------------------------------------------------------------------------
 # Phase 3: Post judging comments
 # ---------------------------------------------------------------------------
+def post_judge_comments(fork_name: str, pr_number: int) -> bool:
+    """Post the review trigger + judging prompt on one PR."""
+    # First: trigger CodeRabbit to actually review (it skips non-default base branches)
+    gh("POST", f"/repos/{fork_name}/issues/{pr_number}/comments",
+       json={"body": "@coderabbitai review"})
+    time.sleep(2)
+
+    # Second: post the judging prompt
+    resp = gh("POST", f"/repos/{fork_name}/issues/{pr_number}/comments",
+              json={"body": JUDGE_PROMPT})
+    return resp.status_code in (200, 201)
+
+
 def phase_comment(precomputed: dict, state: dict) -> dict:
-    """Post @coderabbitai judging comments on all PRs."""
+    """Post @coderabbitai judging comments on all PRs (concurrently)."""
     print(f"\n{'='*60}")
     print(f"PHASE 3: POSTING JUDGING COMMENTS")
     print(f"{'='*60}")
 
+    todo = []
     for username in precomputed:
         user_state = state.get(username, {})
         if not user_state.get("pr_number"):
             continue
         if user_state.get("comment_posted"):
             continue
-
-        fork_name = user_state["fork_name"]
-        pr_number = user_state["pr_number"]
-        print(f"  [{username}] Commenting on {fork_name} PR #{pr_number}…", end=" ", flush=True)
-
-        # First: trigger CodeRabbit to actually review (it skips non-default base branches)
-        gh("POST", f"/repos/{fork_name}/issues/{pr_number}/comments",
-           json={"body": "@coderabbitai review"})
-        time.sleep(2)
-
-        # Second: post the judging prompt
-        resp = gh("POST", f"/repos/{fork_name}/issues/{pr_number}/comments",
-                  json={"body": JUDGE_PROMPT})
-
-        if resp.status_code in (200, 201):
-            print("OK")
-            state[username]["comment_posted"] = True
-            state[username]["comment_time"] = datetime.now(timezone.utc).isoformat()
-        else:
-            print(f"FAILED ({resp.status_code})")
-
-        save_state(state)
-        time.sleep(1)
-
+        todo.append((username, user_state["fork_name"], user_state["pr_number"]))
+
+    # One timestamp for the whole phase — comment_time only feeds the
+    # poll's since= filter, and datetime formatting per user adds up
+    now_iso = datetime.now(timezone.utc).isoformat()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(post_judge_comments, fork_name, pr_number): (username, fork_name, pr_number)
+            for username, fork_name, pr_number in todo
+        }
+        for future in as_completed(futures):
+            username, fork_name, pr_number = futures[future]
+            if future.result():
+                print(f"  [{username}] Commented on {fork_name} PR #{pr_number}")
+                state[username]["comment_posted"] = True
+                state[username]["comment_time"] = now_iso
+                save_delta(username, {"comment_posted": True, "comment_time": now_iso})
+            else:
+                print(f"  [{username}] Comment on {fork_name} PR #{pr_number} FAILED")
+
+    save_state(state)
     return state
 
 
 # ---------------------------------------------------------------------------
 # Phase 4: Poll for CodeRabbit responses
 # ---------------------------------------------------------------------------
+# Precompiled parsing regexes — phase_poll runs these over every comment
+# of every pending PR on every poll tick
+JSON_BLOCK_RE = re.compile(r"```json\s*\n(.*?)\n\s*```", re.DOTALL)
+GRADE_BOLD_RE = re.compile(r"\*\*(?:GRADE|Grade|grade)\*\*[:\s]*([A-F][+-]?)")
+VERDICT_BOLD_RE = re.compile(r"\*\*(?:VERDICT|Verdict|verdict)\*\*[:\s]*\"?([^\"\\n]+)\"?")
+BADGE_BOLD_RE = re.compile(r"\*\*(?:BADGE|Badge|badge)\*\*[:\s]*\"?([^\"\\n]+)\"?")
+GRADE_LOOSE_RE = re.compile(r"(?:grade|Grade)[:\s]+([A-F][+-]?)")
+VERDICT_LOOSE_RE = re.compile(r"(?:verdict|Verdict)[:\s]+\"([^\"]+)\"")
+BADGE_LOOSE_RE = re.compile(r"(?:badge|Badge)[:\s]+\"?([A-Za-z][^\"\\n]{2,40})\"?")
+GRADE_TEXT_RE = re.compile(r"(?:grade|Grade|GRADE)[:\s]+[A-F][+-]?")
+SENTENCE_SPLIT_RE = re.compile(r"[.!]\s")
+
+# One C-level scan instead of a Python loop over five substring checks
+SKIP_PHRASES_RE = re.compile(
+    r"auto-generated comment|Review skipped|Actions performed"
+    r"|Review triggered|finishing_touch_checkbox"
+)
+
+
 def parse_coderabbit_response(body: str) -> dict:
     """Extract grade, verdict, badge from CodeRabbit's markdown response."""
-    # Strategy 1: JSON code block
-    json_match = re.search(r"```json\s*\n(.*?)\n\s*```", body, re.DOTALL)
-    if json_match:
-        try:
-            data = json.loads(json_match.group(1))
-            return {
-                "quality_grade": str(data.get("grade", "Pending")),
-                "verdict": str(data.get("verdict", "Pending review...")),
-                "coderabbit_badge": str(data.get("badge", "Unknown")),
-            }
-        except json.JSONDecodeError:
-            pass
+    # Strategy 1: JSON code block — substring check first so the DOTALL
+    # regex never scans a 10 KB walkthrough comment that can't match
+    if "```json" in body:
+        json_match = JSON_BLOCK_RE.search(body)
+        if json_match:
+            try:
+                data = json.loads(json_match.group(1))
+                return {
+                    "quality_grade": str(data.get("grade", "Pending")),
+                    "verdict": str(data.get("verdict", "Pending review...")),
+                    "coderabbit_badge": str(data.get("badge", "Unknown")),
+                }
+            except json.JSONDecodeError:
+                pass
+
+    # No grade anywhere → skip all six field regexes; CodeRabbit's actual
+    # judging replies always name the grade
+    if "grade" not in body.lower():
+        return {
+            "quality_grade": "Pending",
+            "verdict": extract_first_roast(body),
+            "coderabbit_badge": "Unknown",
+        }
 
     # Strategy 2: Look for bold-labelled fields
-    grade = re.search(r"\*\*(?:GRADE|Grade|grade)\*\*[:\s]*([A-F][+-]?)", body)
-    verdict = re.search(r"\*\*(?:VERDICT|Verdict|verdict)\*\*[:\s]*\"?([^\"\\n]+)\"?", body)
-    badge = re.search(r"\*\*(?:BADGE|Badge|badge)\*\*[:\s]*\"?([^\"\\n]+)\"?", body)
+    grade = GRADE_BOLD_RE.search(body)
+    verdict = VERDICT_BOLD_RE.search(body)
+    badge = BADGE_BOLD_RE.search(body)
 
     # Strategy 3: Loose search
     if not grade:
-        grade = re.search(r"(?:grade|Grade)[:\s]+([A-F][+-]?)", body)
+        grade = GRADE_LOOSE_RE.search(body)
     if not verdict:
-        verdict = re.search(r"(?:verdict|Verdict)[:\s]+\"([^\"]+)\"", body)
+        verdict = VERDICT_LOOSE_RE.search(body)
     if not badge:
-        badge = re.search(r"(?:badge|Badge)[:\s]+\"?([A-Za-z][^\"\\n]{2,40})\"?", body)
+        badge = BADGE_LOOSE_RE.search(body)
 
     return {
         "quality_grade": grade.group(1) if grade else "Pending",
@@ -408,7 +747,7 @@ def parse_coderabbit_response(body: str) -> dict:
 
 def extract_first_roast(body: str) -> str:
     """Fallback: grab the first sentence that looks like a roast."""
-    sentences = re.split(r"[.!]\s", body)
+    sentences = SENTENCE_SPLIT_RE.split(body)
     for s in sentences:
         s = s.strip()
         if len(s) > 30 and not s.startswith(("I", "The PR", "This pull", "Here")):
@@ -416,6 +755,42 @@ def extract_first_roast(body: str) -> str:
     return "Pending review…"
 
 
+# One aliased GraphQL query covers the comment lists of up to 100 PRs, so
+# each poll tick costs O(pending/100) requests instead of O(pending) REST
+# calls — the dominant quota drain while waiting on CodeRabbit.
+PR_COMMENTS_BATCH_SIZE = 100
+
+
+def fetch_pr_comments_batched(targets: list[tuple[str, str, int]]) -> dict[str, list[dict]]:
+    """Fetch recent PR comments for many forks at once via aliased GraphQL.
+
+    targets is (username, fork_name, pr_number) tuples. Returns
+    username → list of {author: {login}, body} nodes. Users whose repo
+    errored in the batch are simply absent (callers re-poll them).
+    """
+    results: dict[str, list[dict]] = {}
+    for start in range(0, len(targets), PR_COMMENTS_BATCH_SIZE):
+        batch = targets[start:start + PR_COMMENTS_BATCH_SIZE]
+        parts = []
+        for i, (_username, fork_name, pr_number) in enumerate(batch):
+            owner, name = fork_name.split("/")
+            parts.append(
+                f'r{i}: repository(owner: "{owner}", name: "{name}") {{'
+                f' pullRequest(number: {pr_number}) {{'
+                " comments(last: 50) { nodes { author { login } body } } } }"
+            )
+        resp = gh("POST", "/graphql", json={"query": "query {\n" + "\n".join(parts) + "\n}"})
+        if resp.status_code != 200:
+            continue
+        # Keep partial data — a single errored repo shouldn't sink the batch
+        data = resp.json().get("data") or {}
+        for i, (username, _fork, _pr) in enumerate(batch):
+            pr = (data.get(f"r{i}") or {}).get("pullRequest")
+            if pr is not None:
+                results[username] = (pr.get("comments") or {}).get("nodes") or []
+    return results
+
+
 def phase_poll(precomputed: dict, state: dict) -> dict:
     """Poll for CodeRabbit responses on all commented PRs."""
     print(f"\n{'='*60}")
@@ -437,43 +812,51 @@ def phase_poll(precomputed: dict, state: dict) -> dict:
 
     print(f"  Waiting for {len(pending)} responses…\n")
     start = time.time()
+    interval = POLL_INTERVAL_MIN
 
     while pending and (time.time() - start) < POLL_TIMEOUT:
-        still_pending = []
-        for username in pending:
-            user_state = state[username]
-            fork_name = user_state["fork_name"]
-            pr_number = user_state["pr_number"]
-            since = user_state.get("comment_time", "2026-01-01T00:00:00Z")
-
+        targets = [(u, state[u]["fork_name"], state[u]["pr_number"]) for u in pending]
+        if len(targets) == 1:
+            # Tail case: a REST GET with since + If-None-Match (served by
+            # the gh() ETag cache) returns a quota-free 304 while nothing
+            # new arrives — GraphQL POSTs can't do conditional requests
+            username, fork_name, pr_number = targets[0]
+            since = state[username].get("comment_time", "2026-01-01T00:00:00Z")
             resp = gh("GET", f"/repos/{fork_name}/issues/{pr_number}/comments",
                       params={"since": since})
-            if resp.status_code != 200:
+            comments_by_user = {}
+            if resp.status_code == 200:
+                comments_by_user[username] = [
+                    {"author": {"login": c["user"]["login"]}, "body": c["body"]}
+                    for c in resp.json()
+                ]
+        else:
+            comments_by_user = fetch_pr_comments_batched(targets)
+
+        still_pending = []
+        for username in pending:
+            nodes = comments_by_user.get(username)
+            if nodes is None:
                 still_pending.append(username)
                 continue
 
             found = False
-            for comment in resp.json():
-                login = comment["user"]["login"].lower()
+            for comment in nodes:
+                login = ((comment.get("author") or {}).get("login") or "").lower()
                 if "coderabbit" not in login:
                     continue
                 body = comment["body"]
-                # Skip auto-generated status/action comments
-                skip_phrases = [
-                    "auto-generated comment",
-                    "Review skipped",
-                    "Actions performed",
-                    "Review triggered",
-                    "finishing_touch_checkbox",
-                ]
-                if any(phrase in body for phrase in skip_phrases):
+                # Skip auto-generated status/action comments. Scan the whole
+                # body: markers like finishing_touch_checkbox often sit at
+                # the bottom, and the full regex pass costs microseconds
+                if SKIP_PHRASES_RE.search(body):
                     continue
                 if len(body) < 200:
                     continue
                 # Skip auto-review walkthroughs that don't contain a judging response
                 # The actual judging response will contain "grade" (from the JSON block)
                 has_grade_json = "```json" in body and "grade" in body.lower()
-                has_grade_text = re.search(r"(?:grade|Grade|GRADE)[:\s]+[A-F][+-]?", body)
+                has_grade_text = GRADE_TEXT_RE.search(body)
                 if not has_grade_json and not has_grade_text:
                     continue
                 result = parse_coderabbit_response(body)
@@ -482,28 +865,33 @@ def phase_poll(precomputed: dict, state: dict) -> dict:
                 state[username]["response_parsed"] = True
                 state[username]["result"] = result
                 state[username]["raw_response"] = body
-                save_state(state)
+                save_delta(username, {
+                    "response_parsed": True, "result": result, "raw_response": body,
+                })
                 found = True
                 break
 
             if not found:
                 still_pending.append(username)
 
+        progressed = len(still_pending) < len(pending)
         pending = still_pending
         if pending:
             elapsed = int(time.time() - start)
-            print(f"  … {len(pending)} still waiting ({elapsed}s elapsed)")
-            time.sleep(POLL_INTERVAL)
+            print(f"  … {len(pending)} still waiting ({elapsed}s elapsed, next poll in {interval:.0f}s)")
+            time.sleep(interval)
+            interval = POLL_INTERVAL_MIN if progressed else min(interval * POLL_BACKOFF, POLL_INTERVAL_MAX)
 
     if pending:
         print(f"\n  Timed out on {len(pending)} users: {pending}")
         for username in pending:
-            state[username]["result"] = {
+            result = {
                 "quality_grade": "Pending",
                 "verdict": "Pending review…",
                 "coderabbit_badge": "Unknown",
             }
-            save_state(state)
+            state[username]["result"] = result
+            save_delta(username, {"result": result})
 
     return state
 
@@ -5,13 +5,40 @@ using already-saved raw_data/<user>/commits.json.
 No GitHub API calls needed.
 """
 
+import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+AXES = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
+
 OUTPUT_FILE = Path("precomputed.json")
 RAW_DATA_DIR = Path("raw_data")
 
 
+def load_commits(username: str):
+    """Resolve and parse one user's cached commits (runs on the I/O pool).
+
+    Returns (commits_file, raw_bytes, texts), or (None, None, None) when no
+    cached commits exist.
+    """
+    commits_file = RAW_DATA_DIR / username.lower() / "commits.json"
+    if not commits_file.exists():
+        # Try exact case
+        commits_file = RAW_DATA_DIR / username / "commits.json"
+    if not commits_file.exists():
+        return None, None, None
+    raw = commits_file.read_bytes()
+    return commits_file, raw, orjson.loads(raw) if orjson else json.loads(raw)
+
+
 def main():
     if not OUTPUT_FILE.exists():
         print("No precomputed.json found.")
@@ -23,6 +50,16 @@ def main():
     # Lazy-load model only if needed
     model = None
 
+    # Kick off every commit read up front: the pool reads and parses files
+    # in the background while the main thread runs the model on earlier
+    # users, so the GPU never stalls waiting on disk
+    io_pool = ThreadPoolExecutor(max_workers=16)
+    pending_loads = {
+        username: io_pool.submit(load_commits, username)
+        for username, info in data.items()
+        if not info.get("worst_commit_msg")
+    }
+
     patched = 0
     for username, info in data.items():
         # Skip if already has worst commit data
@@ -31,58 +68,79 @@ def main():
             patched += 1
             continue
 
-        # Load cached commits
-        commits_file = RAW_DATA_DIR / username.lower() / "commits.json"
-        if not commits_file.exists():
-            # Try exact case
-            commits_file = RAW_DATA_DIR / username / "commits.json"
-        if not commits_file.exists():
+        commits_file, raw, texts = pending_loads[username].result()
+        if commits_file is None:
             print(f"  {username}: no cached commits found, setting defaults")
             info["worst_commit_toxicity"] = 0.0
             info["worst_commit_msg"] = ""
             continue
 
-        texts = json.loads(commits_file.read_text())
         if not texts:
             print(f"  {username}: empty commits, setting defaults")
             info["worst_commit_toxicity"] = 0.0
             info["worst_commit_msg"] = ""
             continue
 
-        # Load model on first use
-        if model is None:
-            import torch
-            from detoxify import Detoxify
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            model = Detoxify("original", device=device)
-            print(f"Toxicity model loaded on {device}")
-            _torch = torch
-        else:
-            import torch as _torch
-
-        # Batch predict
-        axes = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
-        all_scores = {k: [] for k in axes}
-        batch_size = 32
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            with _torch.no_grad():
-                results = model.predict(batch)
-            for k in axes:
-                all_scores[k].extend(results[k])
-
-        if _torch.cuda.is_available():
-            _torch.cuda.empty_cache()
-
-        # Find worst commit (highest score on any axis)
-        worst_idx = None
-        worst_score = 0.0
-        for idx in range(len(texts)):
-            for axis in axes:
-                score = float(all_scores[axis][idx])
-                if score > worst_score:
-                    worst_score = score
-                    worst_idx = idx
+        # Commits are immutable, so scores keyed by the file's content hash
+        # stay valid forever — reruns skip the model entirely for users
+        # whose commits.json hasn't changed
+        content_hash = hashlib.blake2b(raw).hexdigest()[:16]
+        scores_file = commits_file.parent / f".scores_{content_hash}.npz"
+        score_mat = None
+        if scores_file.exists():
+            try:
+                score_mat = np.load(scores_file)["scores"]
+            except (OSError, ValueError, KeyError):
+                score_mat = None
+
+        if score_mat is None:
+            # Load model on first use
+            if model is None:
+                import torch
+                from detoxify import Detoxify
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                model = Detoxify("original", device=device)
+                print(f"Toxicity model loaded on {device}")
+                _torch = torch
+            else:
+                import torch as _torch
+
+            # Developers repeat "wip"/"fix"-style messages constantly —
+            # score each distinct message once and scatter back at the end
+            unique = list(dict.fromkeys(texts))
+
+            # Batch predict — commit messages are short, so large fp16 batches
+            # keep the GPU fed; inference_mode beats no_grad (no view tracking)
+            all_scores = {k: [] for k in AXES}
+            batch_size = 128
+            use_cuda = _torch.cuda.is_available()
+            for i in range(0, len(unique), batch_size):
+                batch = unique[i : i + batch_size]
+                with _torch.inference_mode():
+                    if use_cuda:
+                        with _torch.autocast("cuda", dtype=_torch.float16):
+                            results = model.predict(batch)
+                    else:
+                        results = model.predict(batch)
+                for k in AXES:
+                    all_scores[k].extend(results[k])
+
+            # Find worst commit (highest score on any axis) — one (N, 6) max
+            # reduction instead of 6N Python-level float comparisons
+            uniq_mat = np.stack(
+                [np.asarray(all_scores[k], dtype=np.float32) for k in AXES], axis=1
+            )
+            idx_map = {t: i for i, t in enumerate(unique)}
+            score_mat = uniq_mat[[idx_map[t] for t in texts]]
+            try:
+                np.savez_compressed(scores_file, scores=score_mat)
+            except OSError:
+                pass
+        per_commit_max = score_mat.max(axis=1)
+        worst_idx = int(per_commit_max.argmax())
+        worst_score = float(per_commit_max[worst_idx])
+        if worst_score <= 0.0:
+            worst_idx = None
 
         if worst_idx is not None:
             info["worst_commit_toxicity"] = worst_score
@@ -91,11 +149,11 @@ def main():
             worst_data = {
                 "message": texts[worst_idx],
                 "toxicity_score": worst_score,
-                "all_scores": {axis: float(all_scores[axis][worst_idx]) for axis in axes},
+                "all_scores": dict(zip(AXES, score_mat[worst_idx].astype(float).tolist())),
             }
             worst_file = (RAW_DATA_DIR / username / "worst_commit.json")
             if worst_file.parent.exists():
-                worst_file.write_text(json.dumps(worst_data, indent=2))
+                worst_file.write_text(json.dumps(worst_data))
         else:
             info["worst_commit_toxicity"] = 0.0
             info["worst_commit_msg"] = ""
@@ -103,6 +161,7 @@ def main():
         patched += 1
         print(f"  {username}: worst={worst_score:.3f} \"{(texts[worst_idx] if worst_idx is not None else '')[:60]}\"")
 
+    io_pool.shutdown()
     OUTPUT_FILE.write_text(json.dumps(data, indent=2))
     print(f"\nDone. Patched {patched}/{len(data)} users in {OUTPUT_FILE}")
 
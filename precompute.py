@@ -10,17 +10,44 @@ Usage:
     4. python precompute.py
 """
 
-import itertools
+import gzip
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+# ijson streams large JSON incrementally instead of materializing the whole
+# file as a Python string first. Optional dep — fall back to stdlib json.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# orjson parses every GraphQL response and serializes every user record —
+# the dominant per-user CPU cost after the network. Optional, like ijson.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def json_dumps(obj) -> str:
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj)
 
 # ---------------------------------------------------------------------------
 # Config
@@ -30,6 +57,9 @@ load_dotenv()
 GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
 USERNAMES_FILE = Path("usernames.txt")
 OUTPUT_FILE = Path("precomputed.json")
+# Per-user results are appended here as the run progresses; OUTPUT_FILE is
+# compacted from it once at the end (downstream scripts read the dict file)
+APPEND_FILE = Path("precomputed.jsonl")
 RAW_DATA_DIR = Path("raw_data")
 
 # ---------------------------------------------------------------------------
@@ -40,19 +70,41 @@ if not raw_tokens:
     sys.exit("ERROR: GITHUB_TOKENS not set. Copy .env.example to .env and add your tokens.")
 
 tokens: list[str] = [t.strip() for t in raw_tokens.split(",") if t.strip()]
-token_cycle = itertools.cycle(tokens)
 token_cooldowns: dict[str, float] = {}  # token -> reset_timestamp
+token_remaining: dict[str, int] = {}    # token -> last seen X-RateLimit-Remaining
+_token_lock = threading.Lock()  # scrape workers rotate tokens concurrently
+
+# Scraping is pure network latency, so run users in parallel. Two in-flight
+# requests per token stays under GitHub's secondary rate limit.
+SCRAPE_WORKERS = min(20, len(tokens) * 2)
+
+# One keep-alive session shared by all workers — a fresh TCP + TLS
+# handshake to api.github.com per request costs more than the query itself.
+# Auth still travels per-request so token rotation is unaffected.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=SCRAPE_WORKERS,
+    pool_maxsize=SCRAPE_WORKERS,
+))
 
 
 def get_next_headers() -> dict[str, str]:
-    """Return Authorization headers using the next available token (round-robin)."""
+    """Return Authorization headers using the token with the most quota left.
+
+    Round-robin rotation starts every token's one-hour window at the same
+    time, so they all exhaust and reset together. Draining the richest
+    token until another overtakes it keeps the windows staggered, which
+    roughly multiplies effective quota by the token count. Tokens we have
+    no data for yet sort first so each gets probed once.
+    """
     now = time.time()
-    for _ in range(len(tokens)):
-        token = next(token_cycle)
-        if token_cooldowns.get(token, 0) <= now:
+    with _token_lock:
+        available = [t for t in tokens if token_cooldowns.get(t, 0) <= now]
+        if available:
+            token = max(available, key=lambda t: token_remaining.get(t, float("inf")))
             return {"Authorization": f"bearer {token}"}
-    # All tokens exhausted — sleep until the earliest reset
-    earliest = min(token_cooldowns.values())
+        # All tokens exhausted — sleep until the earliest reset
+        earliest = min(token_cooldowns.values())
     wait = max(0, earliest - now + 1)
     print(f"  All tokens exhausted. Sleeping {wait:.0f}s until rate-limit reset…")
     time.sleep(wait)
@@ -60,87 +112,62 @@ def get_next_headers() -> dict[str, str]:
 
 
 def record_rate_limit(token_header: str, response: requests.Response) -> None:
-    """Check response headers and record cooldown if a token is exhausted."""
+    """Track each token's remaining quota; record cooldown when exhausted."""
     remaining = response.headers.get("X-RateLimit-Remaining")
     reset_at = response.headers.get("X-RateLimit-Reset")
-    if remaining is not None and int(remaining) == 0 and reset_at is not None:
-        # Extract the raw token from the header
-        raw = token_header.replace("bearer ", "")
-        token_cooldowns[raw] = float(reset_at)
+    if remaining is None:
+        return
+    # Extract the raw token from the header
+    raw = token_header.replace("bearer ", "")
+    with _token_lock:
+        token_remaining[raw] = int(remaining)
+        if int(remaining) == 0 and reset_at is not None:
+            token_cooldowns[raw] = float(reset_at)
+    if int(remaining) == 0 and reset_at is not None:
         print(f"  Token …{raw[-4:]} exhausted. Will reset at {datetime.fromtimestamp(float(reset_at), tz=timezone.utc).isoformat()}")
 
 
 # ---------------------------------------------------------------------------
-# GraphQL query
+# GraphQL query — profile, commit history, and READMEs in one document.
+# The scraper used to spend three round-trips per user on these; aliasing
+# both repository selections into a single query cuts that to one request
+# (and one hit against the hourly GraphQL budget).
 # ---------------------------------------------------------------------------
-PROFILE_QUERY = """
-query($login: String!) {
-  user(login: $login) {
-    login
-    name
-    bio
-    company
-    location
-    followers {
-      totalCount
-    }
-    repositories(first: 10, orderBy: {field: STARGAZERS, direction: DESC}, ownerAffiliations: OWNER) {
-      nodes {
-        name
-        stargazerCount
-        primaryLanguage { name }
-        description
-      }
-      totalCount
-    }
-    contributionsCollection {
-      totalCommitContributions
-      restrictedContributionsCount
-    }
+USER_FIELDS_FRAGMENT = """
+fragment UserFields on User {
+  login
+  name
+  bio
+  company
+  location
+  followers {
+    totalCount
   }
-}
-"""
-
-RECENT_COMMITS_QUERY = """
-query($login: String!) {
-  user(login: $login) {
-    repositories(first: 5, orderBy: {field: PUSHED_AT, direction: DESC}, ownerAffiliations: OWNER) {
-      nodes {
-        name
-        defaultBranchRef {
-          target {
-            ... on Commit {
-              history(first: 10, author: {id: null}) {
-                nodes {
-                  message
-                }
-              }
-            }
-          }
+  topRepos: repositories(first: 10, orderBy: {field: STARGAZERS, direction: DESC}, ownerAffiliations: OWNER) {
+    nodes {
+      name
+      stargazerCount
+      primaryLanguage { name }
+      description
+      object(expression: "HEAD:README.md") {
+        ... on Blob {
+          text
         }
       }
     }
+    totalCount
   }
-}
-"""
-
-# Simpler commit query that doesn't filter by author (works without user node ID)
-# Fetches comprehensive commit history: 100 repos, 100 commits per repo
-RECENT_COMMITS_QUERY_SIMPLE = """
-query($login: String!) {
-  user(login: $login) {
-    repositories(first: 100, orderBy: {field: PUSHED_AT, direction: DESC}, ownerAffiliations: OWNER) {
-      nodes {
-        name
-        defaultBranchRef {
-          target {
-            ... on Commit {
-              history(first: 100) {
-                nodes {
-                  message
-                  author {
-                    user { login }
-                  }
+  recentRepos: repositories(first: 100, orderBy: {field: PUSHED_AT, direction: DESC}, ownerAffiliations: OWNER) {
+    nodes {
+      name
+      defaultBranchRef {
+        target {
+          ... on Commit {
+            history(first: 100) {
+              nodes {
+                message
+                author {
+                  user { login }
                 }
               }
             }
@@ -149,164 +176,206 @@ query($login: String!) {
       }
     }
   }
+  contributionsCollection {
+    totalCommitContributions
+    restrictedContributionsCount
+  }
 }
 """
 
-README_QUERY = """
+COMBINED_QUERY = """
 query($login: String!) {
   user(login: $login) {
-    repositories(first: 10, orderBy: {field: STARGAZERS, direction: DESC}, ownerAffiliations: OWNER) {
-      nodes {
-        name
-        object(expression: "HEAD:README.md") {
-          ... on Blob {
-            text
-          }
-        }
-      }
-    }
+    ...UserFields
   }
 }
-"""
+""" + USER_FIELDS_FRAGMENT
 
 # ---------------------------------------------------------------------------
 # Emoji scoring
 # ---------------------------------------------------------------------------
+# One alternation covers unicode emoji runs and GitHub-style :emoji:
+# shortcodes, so each corpus is scanned once instead of twice per text
 EMOJI_RE = re.compile(
-    "["
+    "(?:["
     "\U0001f600-\U0001f64f"  # emoticons
     "\U0001f300-\U0001f5ff"  # symbols & pictographs
     "\U0001f680-\U0001f6ff"  # transport & map
     "\U0001f1e0-\U0001f1ff"  # flags
     "\U00002702-\U000027b0"
     "\U000024c2-\U0001f251"
-    "]+",
+    "]+)|(?::[a-z0-9_+-]+:)",
     flags=re.UNICODE,
 )
 
-# Also count GitHub-style :emoji: shortcodes
 SHORTCODE_RE = re.compile(r":[a-z0-9_+-]+:")
 
 
 def count_emojis(texts: list[str]) -> int:
-    total = 0
-    for t in texts:
-        total += len(EMOJI_RE.findall(t))
-        total += len(SHORTCODE_RE.findall(t))
-    return total
+    # Join once so the regex engine makes a single pass over the whole
+    # corpus; finditer counts matches without building a result list
+    joined = "\n".join(texts)
+    if joined.isascii():
+        # The common case: an all-ASCII corpus can't contain unicode
+        # emoji, and :shortcode: forms need a colon — both checks run at
+        # C speed and usually skip the unicode scan entirely
+        return len(SHORTCODE_RE.findall(joined)) if ":" in joined else 0
+    return sum(1 for _ in EMOJI_RE.finditer(joined))
 
 
 # ---------------------------------------------------------------------------
-# Toxicity detection
+# Toxicity detection — the model itself lives in toxicity.py, which handles
+# INT8 quantization on CPU, torch.compile on GPU, and BF16 autocast where
+# the hardware supports it. Import lazily so `--help` stays fast.
 # ---------------------------------------------------------------------------
-_detoxify_model = None
+_predict_lock = threading.Lock()  # one forward pass at a time across workers
 
 
-def get_toxicity_model():
-    """Lazy-load the Detoxify model to avoid startup overhead."""
-    global _detoxify_model
-    if _detoxify_model is None:
-        from detoxify import Detoxify
+# Tiny per-user batches starve the accelerator; scoring every scraped
+# user's commits in one concatenated pass keeps it fed
+TOXICITY_AXES = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
+TOXICITY_BATCH = 512
 
-        import torch
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        _detoxify_model = Detoxify("original", device=device)
-        print(f"    Toxicity model loaded on {device}")
-    return _detoxify_model
 
+# --- CPU fallback: shard inference across a process pool -------------------
+# Without a GPU the forward pass is GIL-bound in one interpreter; separate
+# processes each score a chunk with their own quantized model. One torch
+# thread per worker prevents oversubscription.
+_worker_model = None
 
-def find_worst_commit(texts: list[str]) -> dict | None:
-    """
-    Analyze toxicity in individual commit messages.
-    Returns dict with the worst commit (highest score on any axis).
-    Returns None if no commits available or analysis fails.
-    """
-    if not texts:
-        return None
 
-    try:
-        model = get_toxicity_model()
-        results = model.predict(texts)
-
-        # Define toxicity axes
-        axes = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
-
-        # Find the worst commit (highest score on any axis)
-        worst_idx = None
-        worst_axis = None
-        worst_score = 0.0
-
-        for idx, text in enumerate(texts):
-            for axis in axes:
-                score = float(results[axis][idx])
-                if score > worst_score:
-                    worst_score = score
-                    worst_idx = idx
-                    worst_axis = axis
-
-        if worst_idx is None:
-            return None
+def _init_cpu_worker() -> None:
+    os.environ["OMP_NUM_THREADS"] = "1"
+    import torch
+    torch.set_num_threads(1)
 
-        # Get all scores for the worst commit
-        worst_text = texts[worst_idx]
-        all_scores = {axis: float(results[axis][worst_idx]) for axis in axes}
 
-        return {
-            "message": worst_text,
-            "toxicity_axis": worst_axis,
-            "toxicity_score": worst_score,
-            "all_scores": all_scores,
-        }
-    except Exception as e:
-        print(f"    Finding worst commit failed: {e}")
-        return None
+def _score_chunk_cpu(texts: list[str]) -> dict[str, list[float]]:
+    """Score one chunk of texts in a CPU worker process."""
+    global _worker_model
+    if _worker_model is None:
+        from detoxify import Detoxify
+        from toxicity import quantize_model
+        _worker_model = Detoxify("original", device="cpu")
+        _worker_model.model = quantize_model(_worker_model.model)
+    results = _worker_model.predict(texts)
+    return {k: [float(v) for v in results[k]] for k in TOXICITY_AXES}
+
+
+# One pool for the whole run, created on first use. batch_toxicity runs
+# once per scraped chunk, so a per-call pool would reload + requantize the
+# model in every worker for every chunk — the init cost must outlive the
+# call to amortize. spawn rather than fork: the scrape thread pool is live
+# when the first chunk lands, and forking a threaded process is
+# deadlock-prone.
+_cpu_pool = None
+
+
+def _get_cpu_pool(workers: int) -> ProcessPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        import multiprocessing
+        _cpu_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_cpu_worker,
+        )
+    return _cpu_pool
 
 
-def analyze_toxicity(texts: list[str]) -> dict:
+def batch_toxicity(commits_by_user: dict[str, list[str]]) -> dict[str, dict]:
     """
-    Analyze toxicity in a list of texts (commit messages).
-    Returns dict with averaged toxicity scores.
-    Returns all zeros if input is empty or model fails.
+    Analyze toxicity for every user's commits in one cross-user model pass.
+    Concatenates all commit lists, predicts in large batches, then slices
+    the scores back out per user. Returns {username: score dict}; users
+    get all zeros if they have no commits or the model fails.
     """
-    keys = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
-    zero = {k: 0.0 for k in keys}
+    zero = {k: 0.0 for k in TOXICITY_AXES}
     zero["worst_commit_toxicity"] = 0.0
     zero["worst_commit_msg"] = ""
+    results_by_user = {u: dict(zero) for u in commits_by_user}
+
+    all_texts: list[str] = []
+    spans: list[tuple[str, int, int]] = []  # (username, start, end)
+    for username, texts in commits_by_user.items():
+        spans.append((username, len(all_texts), len(all_texts) + len(texts)))
+        all_texts.extend(texts)
 
-    if not texts:
-        return zero
+    if not all_texts:
+        return results_by_user
+
+    # Duplicate messages ("Update README", merge commits, bot templates)
+    # are scored once; `back` scatters unique scores to original positions
+    unique = list(dict.fromkeys(all_texts))
+    idx_map = {s: i for i, s in enumerate(unique)}
+    back = np.asarray([idx_map[s] for s in all_texts], dtype=np.int64)
 
     try:
         import torch
-        model = get_toxicity_model()
-        all_scores = {k: [] for k in keys}
-
-        # Process in small batches to avoid CUDA OOM
-        batch_size = 32
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            with torch.no_grad():
-                results = model.predict(batch)
-            for k in keys:
-                all_scores[k].extend(results[k])
-
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-
-        # Find the single most toxic commit
-        tox = all_scores["toxicity"]
-        worst_idx = max(range(len(tox)), key=lambda i: tox[i])
-
-        avg = {
-            k: float(sum(all_scores[k]) / len(all_scores[k]))
-            for k in keys
-        }
-        avg["worst_commit_toxicity"] = float(tox[worst_idx])
-        avg["worst_commit_msg"] = texts[worst_idx]
-        return avg
+
+        all_scores = {k: [] for k in TOXICITY_AXES}
+        batches = [unique[i : i + TOXICITY_BATCH]
+                   for i in range(0, len(unique), TOXICITY_BATCH)]
+
+        cores = os.cpu_count() or 1
+        if not torch.cuda.is_available() and cores >= 4 and len(batches) > 1:
+            # No GPU: fan batches across the persistent process pool, one
+            # warm quantized model per worker — near-linear in physical cores
+            pool = _get_cpu_pool(cores)
+            for chunk_scores in pool.map(_score_chunk_cpu, batches):
+                for k in TOXICITY_AXES:
+                    all_scores[k].extend(chunk_scores[k])
+        else:
+            from toxicity import get_toxicity_model, predict_autocast
+
+            model = get_toxicity_model()
+            for batch in batches:
+                with _predict_lock, torch.inference_mode():
+                    results = predict_autocast(model, batch)
+                for k in TOXICITY_AXES:
+                    all_scores[k].extend(results[k])
+
+            # One cache drop for the whole phase — emptying per batch
+            # forces a device sync every TOXICITY_BATCH texts
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
     except Exception as e:
         print(f"    Toxicity analysis failed: {e}")
-        return zero
+        return results_by_user
+
+    # Materialize as float32 arrays once and expand back to full length —
+    # C-level mean/argmax on per-user slices works unchanged
+    arrays = {k: np.asarray(v, dtype=np.float32)[back] for k, v in all_scores.items()}
+
+    for username, start, end in spans:
+        if end == start:
+            continue
+        texts = commits_by_user[username]
+        rec = results_by_user[username]
+        for k in TOXICITY_AXES:
+            rec[k] = float(arrays[k][start:end].mean())
+
+        # Single most toxic commit on the main axis (feeds the record)
+        tox = arrays["toxicity"][start:end]
+        worst_idx = int(tox.argmax())
+        rec["worst_commit_toxicity"] = float(tox[worst_idx])
+        rec["worst_commit_msg"] = texts[worst_idx]
+
+        # Worst on ANY axis (feeds raw_data/<user>/worst_commit.json) —
+        # one (N, 6) argmax over the already-computed scores instead of
+        # the second forward pass find_worst_commit used to burn
+        arr = np.stack([arrays[k][start:end] for k in TOXICITY_AXES], axis=1)
+        wi, ai = divmod(int(arr.argmax()), len(TOXICITY_AXES))
+        worst_file = RAW_DATA_DIR / username / "worst_commit.json"
+        if worst_file.parent.exists():
+            worst_file.write_text(json_dumps({
+                "message": texts[wi],
+                "toxicity_axis": TOXICITY_AXES[ai],
+                "toxicity_score": float(arr[wi, ai]),
+                "all_scores": {k: float(arr[wi, j]) for j, k in enumerate(TOXICITY_AXES)},
+            }))
+
+    return results_by_user
 
 
 # ---------------------------------------------------------------------------
@@ -315,12 +384,35 @@ def analyze_toxicity(texts: list[str]) -> dict:
 MAX_RETRIES = 5
 INITIAL_BACKOFF = 0.5  # seconds
 
+# On-disk cache of raw GraphQL responses keyed by query+variables, so
+# re-runs (e.g. after retuning the post-processing) replay from local disk
+# instead of re-spending API quota. gzip shrinks GraphQL JSON ~4×.
+GQL_CACHE_DIR = Path("gql_cache")
+GQL_CACHE_TTL = 86400  # seconds
+
+
+def _gql_cache_path(query: str, variables: dict) -> Path:
+    key = hashlib.sha256((query + json_dumps(variables)).encode()).hexdigest()
+    return GQL_CACHE_DIR / f"{key}.json.gz"
+
+
+def graphql(query: str, variables: dict, ignore_not_found: bool = False) -> dict:
+    """Execute a GitHub GraphQL query with token rotation and exponential backoff.
+
+    With ignore_not_found, NOT_FOUND errors are dropped so an aliased
+    multi-user query still returns its partial data (missing users come
+    back as null) instead of raising for the whole batch.
+    """
+    cache_path = _gql_cache_path(query, variables)
+    if cache_path.exists() and time.time() - cache_path.stat().st_mtime < GQL_CACHE_TTL:
+        try:
+            return json_loads(gzip.decompress(cache_path.read_bytes()))
+        except (OSError, ValueError):
+            pass  # corrupt cache entry — refetch
 
-def graphql(query: str, variables: dict) -> dict:
-    """Execute a GitHub GraphQL query with token rotation and exponential backoff."""
     for attempt in range(MAX_RETRIES):
         headers = get_next_headers()
-        resp = requests.post(
+        resp = SESSION.post(
             GITHUB_GRAPHQL_URL,
             json={"query": query, "variables": variables},
             headers=headers,
@@ -329,37 +421,115 @@ def graphql(query: str, variables: dict) -> dict:
         record_rate_limit(headers["Authorization"], resp)
 
         if resp.status_code in (502, 503, 429):
-            wait = INITIAL_BACKOFF * (2 ** attempt)
+            # Honor Retry-After when GitHub tells us how long to wait
+            wait = float(resp.headers.get("Retry-After", INITIAL_BACKOFF * (2 ** attempt)))
             print(f"  GitHub returned {resp.status_code}, retrying in {wait:.1f}s…")
             time.sleep(wait)
             continue
 
         resp.raise_for_status()
-        data = resp.json()
+        data = json_loads(resp.content)
         if "errors" in data:
-            raise RuntimeError(f"GraphQL errors: {data['errors']}")
+            errors = data["errors"]
+            if ignore_not_found:
+                errors = [e for e in errors if e.get("type") != "NOT_FOUND"]
+            if errors:
+                raise RuntimeError(f"GraphQL errors: {errors}")
+
+        try:
+            GQL_CACHE_DIR.mkdir(exist_ok=True)
+            cache_path.write_bytes(gzip.compress(json_dumps(data).encode()))
+        except OSError:
+            pass  # cache is best-effort
         return data
 
-    resp.raise_for_status()  # final attempt failed — raise
-    return {}  # unreachable
+    # Retries exhausted — the last response was a retryable 4xx/5xx, so
+    # this always raises
+    resp.raise_for_status()
+    raise RuntimeError(f"GraphQL request failed after {MAX_RETRIES} retries")
 
 
 def scrape_user(username: str) -> dict | None:
     """Fetch profile + recent commits for a single user. Returns dict or None on 404."""
     try:
-        profile_data = graphql(PROFILE_QUERY, {"login": username})
+        data = graphql(COMBINED_QUERY, {"login": username})
     except RuntimeError as e:
         if "Could not resolve to a User" in str(e):
             return None
         raise
 
-    user = profile_data["data"]["user"]
+    user = data["data"]["user"]
     if user is None:
         return None
 
+    result, commit_messages = build_user_result(username, user)
+    result.update(batch_toxicity({username: commit_messages})[username])
+    return result
+
+
+# Users per aliased GraphQL request — one POST resolves a whole chunk of
+# top-level user() selections, amortizing the HTTP round trip 15 ways
+CHUNK_SIZE = 15
+
+
+def scrape_user_chunk(usernames: list[str]) -> list[tuple[str, dict | None, list[str]]]:
+    """Scrape up to CHUNK_SIZE users with one aliased GraphQL request.
+
+    Returns (username, result-or-None, commit_messages) triples; a None
+    result means the user doesn't exist (their alias resolved to null).
+    Toxicity is NOT scored here — the driver batches it across all users.
+    """
+    k = len(usernames)
+    query = (
+        "query(" + ", ".join(f"$l{i}: String!" for i in range(k)) + ") {\n"
+        + "\n".join(f"  u{i}: user(login: $l{i}) {{ ...UserFields }}" for i in range(k))
+        + "\n}\n"
+        + USER_FIELDS_FRAGMENT
+    )
+    variables = {f"l{i}": u for i, u in enumerate(usernames)}
+    try:
+        data = graphql(query, variables, ignore_not_found=True)
+    except (RuntimeError, requests.RequestException) as e:
+        # ignore_not_found only filters NOT_FOUND; anything else (suspended
+        # account → FORBIDDEN, node limits, …) fails the whole batch — and
+        # since chunks re-form identically on rerun, one bad login would
+        # permanently block its 14 neighbours. Retry one user at a time.
+        print(f"  Chunk query failed ({e}), falling back to per-user scrapes")
+        results = []
+        for username in usernames:
+            try:
+                single = graphql(COMBINED_QUERY, {"login": username})
+                user = single["data"]["user"]
+            except Exception as user_err:
+                print(f"  {username} failed: {user_err}")
+                user = None
+            if user is None:
+                results.append((username, None, []))
+            else:
+                result, commit_messages = build_user_result(username, user)
+                results.append((username, result, commit_messages))
+        return results
+
+    results = []
+    for i, username in enumerate(usernames):
+        user = data["data"].get(f"u{i}")
+        if user is None:
+            results.append((username, None, []))
+        else:
+            result, commit_messages = build_user_result(username, user)
+            results.append((username, result, commit_messages))
+    return results
+
+
+def build_user_result(username: str, user: dict) -> tuple[dict, list[str]]:
+    """Turn one user node from COMBINED_QUERY into an output record.
+
+    Returns (record, commit_messages); the record carries zeroed toxicity
+    fields until the cross-user batch pass fills them in.
+    """
     # Aggregate stars
-    total_stars = sum(r["stargazerCount"] for r in user["repositories"]["nodes"])
-    top_repos = [r["name"] for r in user["repositories"]["nodes"]]
+    total_stars = sum(r["stargazerCount"] for r in user["topRepos"]["nodes"])
+    top_repos = [r["name"] for r in user["topRepos"]["nodes"]]
 
     contributions = user["contributionsCollection"]
     commits_last_year = (
@@ -367,56 +537,40 @@ def scrape_user(username: str) -> dict | None:
         + contributions["restrictedContributionsCount"]
     )
 
-    # Fetch recent commit messages for emoji scoring
+    # Recent commit messages for emoji/toxicity scoring
     commit_messages: list[str] = []
-    try:
-        commits_data = graphql(RECENT_COMMITS_QUERY_SIMPLE, {"login": username})
-        repos = commits_data["data"]["user"]["repositories"]["nodes"]
-        for repo in repos:
-            ref = repo.get("defaultBranchRef")
-            if not ref:
-                continue
-            target = ref.get("target")
-            if not target:
-                continue
-            history = target.get("history", {}).get("nodes", [])
-            for commit in history:
-                # Only count commits authored by this user
-                author_user = (commit.get("author") or {}).get("user")
-                if author_user and author_user.get("login", "").lower() == username.lower():
-                    commit_messages.append(commit["message"])
-    except Exception:
-        pass  # Non-critical — emoji score defaults to 0
-
-    # Fetch READMEs for emoji scoring
+    for repo in user["recentRepos"]["nodes"]:
+        ref = repo.get("defaultBranchRef")
+        if not ref:
+            continue
+        target = ref.get("target")
+        if not target:
+            continue
+        history = target.get("history", {}).get("nodes", [])
+        for commit in history:
+            # Only count commits authored by this user
+            author_user = (commit.get("author") or {}).get("user")
+            if author_user and author_user.get("login", "").lower() == username.lower():
+                commit_messages.append(commit["message"])
+
+    # READMEs for emoji scoring (fetched alongside the top repos)
     readme_texts: list[str] = []
     readme_dict: dict[str, str] = {}  # Store {repo_name: readme_content}
-    try:
-        readme_data = graphql(README_QUERY, {"login": username})
-        repos = readme_data["data"]["user"]["repositories"]["nodes"]
-        for repo in repos:
-            repo_name = repo.get("name", "unknown")
-            obj = repo.get("object")
-            if obj and "text" in obj:
-                readme_content = obj["text"]
-                readme_texts.append(readme_content)
-                readme_dict[repo_name] = readme_content
-    except Exception:
-        pass  # Non-critical — defaults to empty list/dict
+    for repo in user["topRepos"]["nodes"]:
+        obj = repo.get("object")
+        if obj and "text" in obj:
+            readme_content = obj["text"]
+            readme_texts.append(readme_content)
+            readme_dict[repo.get("name", "unknown")] = readme_content
 
     # Combine emoji counts from commits AND READMEs
     emoji_score = count_emojis(commit_messages + readme_texts)
 
-    # Analyze toxicity in commit messages
-    toxicity_scores = analyze_toxicity(commit_messages)
+    # Save raw data for future analysis (worst_commit.json is written by
+    # the batched toxicity pass once scores exist)
+    save_raw_data(username, commit_messages, readme_dict)
 
-    # Find worst commit (highest toxicity on any axis)
-    worst_commit = find_worst_commit(commit_messages)
-
-    # Save raw data for future analysis
-    save_raw_data(username, commit_messages, readme_dict, worst_commit)
-
-    return {
+    record = {
         "stars": total_stars,
         "commits_last_year": commits_last_year,
         "emoji_score": emoji_score,
@@ -426,16 +580,17 @@ def scrape_user(username: str) -> dict | None:
         "company": user.get("company") or "",
         "location": user.get("location") or "",
         "followers": user["followers"]["totalCount"],
-        "toxicity": toxicity_scores["toxicity"],
-        "severe_toxicity": toxicity_scores["severe_toxicity"],
-        "obscene": toxicity_scores["obscene"],
-        "threat": toxicity_scores["threat"],
-        "insult": toxicity_scores["insult"],
-        "identity_attack": toxicity_scores["identity_attack"],
-        "worst_commit_toxicity": toxicity_scores["worst_commit_toxicity"],
-        "worst_commit_msg": toxicity_scores["worst_commit_msg"],
+        "toxicity": 0.0,
+        "severe_toxicity": 0.0,
+        "obscene": 0.0,
+        "threat": 0.0,
+        "insult": 0.0,
+        "identity_attack": 0.0,
+        "worst_commit_toxicity": 0.0,
+        "worst_commit_msg": "",
         "scraped_at": datetime.now(timezone.utc).isoformat(),
     }
+    return record, commit_messages
 
 
 # ---------------------------------------------------------------------------
@@ -458,41 +613,69 @@ def load_usernames() -> list[str]:
     return names
 
 
+# Below this size the stdlib parser wins — streaming only pays off once
+# the full-string copy starts to dominate memory
+STREAM_THRESHOLD = 1_000_000
+
+
 def load_existing() -> dict:
+    existing = {}
     if OUTPUT_FILE.exists():
-        return json.loads(OUTPUT_FILE.read_text())
-    return {}
+        if ijson and OUTPUT_FILE.stat().st_size > STREAM_THRESHOLD:
+            # Stream (username, record) pairs off disk — peak memory stays
+            # at one record instead of 2-3× the file size
+            with OUTPUT_FILE.open("rb") as f:
+                for username, record in ijson.kvitems(f, ""):
+                    existing[username] = record
+        else:
+            existing = json_loads(OUTPUT_FILE.read_bytes())
+    # Replay the append log on top — it holds users from runs that were
+    # interrupted before the final compaction
+    if APPEND_FILE.exists():
+        for line in APPEND_FILE.read_text().splitlines():
+            if not line.strip():
+                continue
+            rec = json_loads(line)
+            existing[rec.pop("username")] = rec
+    return existing
+
+
+def save_user(username: str, result: dict) -> None:
+    """Append one user's result — O(1) per user vs rewriting the full dict."""
+    with APPEND_FILE.open("a") as f:
+        f.write(json_dumps({"username": username, **result}) + "\n")
+        f.flush()
 
 
 def save(data: dict) -> None:
-    OUTPUT_FILE.write_text(json.dumps(data, indent=2))
+    if orjson:
+        OUTPUT_FILE.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        OUTPUT_FILE.write_text(json.dumps(data, indent=2))
 
 
-def save_raw_data(username: str, commit_messages: list[str], readme_data: dict, worst_commit: dict | None = None) -> None:
+def save_raw_data(username: str, commit_messages: list[str], readme_data: dict) -> None:
     """
-    Save raw commit messages, README content, and worst commit to user-specific directory.
+    Save raw commit messages and README content to user-specific directory.
 
     Args:
         username: GitHub username
         commit_messages: List of commit message strings
         readme_data: Dict of {repo_name: readme_content}
-        worst_commit: Dict from find_worst_commit() or None
     """
     user_dir = RAW_DATA_DIR / username
     user_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save commits
+    # Save commits (no indent — these are machine-read, and pretty-printing
+    # roughly doubles the bytes written per user)
     commits_file = user_dir / "commits.json"
-    commits_file.write_text(json.dumps(commit_messages, indent=2))
-
-    # Save READMEs
-    readmes_file = user_dir / "readmes.json"
-    readmes_file.write_text(json.dumps(readme_data, indent=2))
+    commits_file.write_text(json_dumps(commit_messages))
 
-    # Save worst commit
-    if worst_commit:
-        worst_file = user_dir / "worst_commit.json"
-        worst_file.write_text(json.dumps(worst_commit, indent=2))
+    # Save READMEs. A missing file and an empty dict read identically
+    # downstream, so skip the serialization + syscalls for README-less users
+    if readme_data:
+        readmes_file = user_dir / "readmes.json"
+        readmes_file.write_text(json_dumps(readme_data))
 
 
 def main() -> None:
@@ -501,31 +684,72 @@ def main() -> None:
     print(f"Using {len(tokens)} GitHub token(s)")
 
     existing = load_existing()
-    already = sum(1 for u in usernames if u.lower() in {k.lower() for k in existing})
+    # Build the lowercase lookup once — the counter used to rebuild it per
+    # username, i.e. len(usernames) × len(existing) lowercasing calls
+    existing_lower = {k.lower(): k for k in existing}
+    already = sum(1 for u in usernames if u.lower() in existing_lower)
     if already:
         print(f"Resuming — {already} already scraped, {len(usernames) - already} remaining")
 
-    existing_lower = {k.lower(): k for k in existing}
-
-    for i, username in enumerate(usernames, 1):
-        if username.lower() in existing_lower:
-            continue
+    remaining = [u for u in usernames if u.lower() not in existing_lower]
 
-        print(f"[{i}/{len(usernames)}] Scraping {username}…", end=" ", flush=True)
+    # Warm-load the model on a background thread so the multi-second BERT
+    # init (plus quantization/compile) overlaps the network-bound scrape
+    # phase instead of stalling the start of the toxicity phase
+    def _warm_model() -> None:
         try:
-            result = scrape_user(username)
+            from toxicity import get_toxicity_model
+            get_toxicity_model()
         except Exception as e:
-            print(f"ERROR: {e}")
-            continue
-
-        if result is None:
-            print("NOT FOUND (skipped)")
-            continue
-
-        existing[username] = result
-        save(existing)
-        print(f"OK — {result['stars']}★  {result['commits_last_year']} commits  {result['emoji_score']} emoji  toxicity={result['toxicity']:.3f}")
+            print(f"  Model warm-up failed (will retry at scoring time): {e}")
+
+    if remaining:
+        threading.Thread(target=_warm_model, daemon=True).start()
+
+    # Scrape CHUNK_SIZE users per aliased GraphQL request, with chunks
+    # fanned out across the thread pool. Results land back on the main
+    # thread via as_completed, so the dicts see no races. Each completed
+    # chunk is toxicity-scored (one cross-user model pass per chunk — the
+    # pool keeps scraping underneath) and appended to the log immediately,
+    # so interrupted runs still resume with complete records.
+    chunks = [remaining[i : i + CHUNK_SIZE] for i in range(0, len(remaining), CHUNK_SIZE)]
+    done = 0
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as pool:
+        futures = {pool.submit(scrape_user_chunk, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                done += len(chunk)
+                print(f"[{done}/{len(remaining)}] chunk ERROR ({', '.join(chunk)}): {e}")
+                continue
 
+            chunk_records: dict[str, dict] = {}
+            chunk_commits: dict[str, list[str]] = {}
+            for username, result, commit_messages in chunk_results:
+                done += 1
+                if result is None:
+                    print(f"[{done}/{len(remaining)}] {username} NOT FOUND (skipped)")
+                    continue
+
+                chunk_records[username] = result
+                chunk_commits[username] = commit_messages
+                print(f"[{done}/{len(remaining)}] {username} OK — {result['stars']}★  "
+                      f"{result['commits_last_year']} commits  {result['emoji_score']} emoji  "
+                      f"{len(commit_messages)} messages")
+
+            if not chunk_records:
+                continue
+            toxicity_by_user = batch_toxicity(chunk_commits)
+            for username, result in chunk_records.items():
+                result.update(toxicity_by_user[username])
+                existing[username] = result
+                save_user(username, result)
+
+    # Compact the append log into the dict file the rest of the pipeline reads
+    save(existing)
+    APPEND_FILE.unlink(missing_ok=True)
     print(f"\nDone. {len(existing)} users saved to {OUTPUT_FILE}")
 
 
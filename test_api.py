@@ -159,7 +159,7 @@ summary = {
     "modules": ["api", "scraper", "toxicity"],
     "endpoints": len(routes),
     "data_storage": "raw_data/",
-    "cache_file": "scrape_results.json",
+    "cache_file": "scrape_results.db",
 }
 
 print(json.dumps(summary, indent=2))
@@ -8,29 +8,29 @@ import json
 with open('precompute.py', 'r') as f:
     content = f.read()
 
-# Check 1: README_QUERY exists
-if 'README_QUERY = """' in content and 'object(expression: "HEAD:README.md")' in content:
-    print("✓ README_QUERY added correctly")
+# Check 1: combined query carries the README blob
+if 'USER_FIELDS_FRAGMENT = """' in content and 'object(expression: "HEAD:README.md")' in content:
+    print("✓ README fetch folded into the combined query")
 else:
-    print("✗ README_QUERY missing or incorrect")
+    print("✗ README fetch missing from the combined query")
 
-# Check 2: get_toxicity_model function exists
-if 'def get_toxicity_model():' in content and 'from detoxify import Detoxify' in content:
-    print("✓ get_toxicity_model function added correctly")
+# Check 2: model loading goes through the shared toxicity module
+if 'from toxicity import get_toxicity_model' in content:
+    print("✓ Model loading delegated to toxicity.get_toxicity_model")
 else:
-    print("✗ get_toxicity_model function missing")
+    print("✗ Shared model loader not used")
 
-# Check 3: analyze_toxicity function exists
-if 'def analyze_toxicity(texts: list[str]) -> dict:' in content and 'results[key].mean()' in content:
-    print("✓ analyze_toxicity function added correctly")
+# Check 3: batched toxicity function exists
+if 'def batch_toxicity(commits_by_user: dict[str, list[str]]) -> dict[str, dict]:' in content:
+    print("✓ batch_toxicity function present")
 else:
-    print("✗ analyze_toxicity function missing")
+    print("✗ batch_toxicity function missing")
 
-# Check 4: README fetching in scrape_user
-if 'readme_texts: list[str] = []' in content and 'graphql(README_QUERY' in content:
-    print("✓ README fetching logic added to scrape_user")
+# Check 4: README parsing in build_user_result
+if 'readme_texts: list[str] = []' in content and 'readme_dict[repo.get("name", "unknown")] = readme_content' in content:
+    print("✓ README parsing logic present")
 else:
-    print("✗ README fetching logic missing")
+    print("✗ README parsing logic missing")
 
 # Check 5: Combined emoji score
 if 'count_emojis(commit_messages + readme_texts)' in content:
@@ -38,23 +38,23 @@ if 'count_emojis(commit_messages + readme_texts)' in content:
 else:
     print("✗ Combined emoji scoring missing")
 
-# Check 6: Toxicity analysis call
-if 'analyze_toxicity(commit_messages)' in content:
-    print("✓ Toxicity analysis call added")
+# Check 6: Toxicity scores merged into each record
+if 'result.update(toxicity_by_user[username])' in content:
+    print("✓ Toxicity scores merged into results")
 else:
-    print("✗ Toxicity analysis call missing")
+    print("✗ Toxicity merge missing")
 
-# Check 7: Return statement has toxicity fields
-if '"toxicity": toxicity_scores["toxicity"],' in content:
+# Check 7: Scrape records carry zeroed toxicity fields until scoring
+if '"toxicity": 0.0,' in content:
     print("✓ Toxicity fields in return statement")
 else:
     print("✗ Toxicity fields missing from return statement")
 
-# Check 8: Print statement shows toxicity
-if "toxicity={result['toxicity']:.3f}" in content:
-    print("✓ Print statement updated with toxicity")
+# Check 8: Progress print shows scraped message count
+if "{len(commit_messages)} messages" in content:
+    print("✓ Progress print shows message count")
 else:
-    print("✗ Print statement not updated")
+    print("✗ Progress print not updated")
 
 # Check 9: environment.yml has detoxify
 with open('environment.yml', 'r') as f:
@@ -3,25 +3,255 @@
 Toxicity detection module using the Detoxify library.
 """
 
+import hashlib
 import json
+import os
+import sqlite3
+import threading
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ---------------------------------------------------------------------------
 # Toxicity detection
 # ---------------------------------------------------------------------------
 _detoxify_model = None
+_model_lock = threading.Lock()  # one loader wins; concurrent callers block on it
+
+AXES = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
+
+
+def quantize_model(model):
+    """Apply INT8 dynamic quantization to a CPU transformer model.
+
+    BERT inference is memory-bandwidth-bound on CPU; quantizing the Linear
+    layers to int8 roughly halves the weight traffic with negligible score
+    drift. Returns the original model unchanged if quantization fails
+    (e.g. unsupported backend).
+    """
+    import torch
+
+    try:
+        return torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    except Exception as e:
+        print(f"    INT8 quantization unavailable, keeping FP32: {e}")
+        return model
+
+
+def _autocast_config():
+    """Return (device_type, dtype) for reduced-precision inference, or None.
+
+    BF16 halves memory traffic on Ampere+ GPUs and AMX-capable CPUs; older
+    CUDA GPUs still get FP16, which their tensor cores handle fine for a
+    thresholded classifier. CPUs without native BF16 run reduced precision
+    drastically SLOWER than FP32, so we probe before enabling anything.
+    """
+    import torch
+
+    if torch.cuda.is_available():
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return "cuda", dtype
+    probe = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    if probe is not None and probe():
+        return "cpu", torch.bfloat16
+    return None
+
+
+def predict_autocast(model, texts: list[str]) -> dict:
+    """Run model.predict under autocast where the hardware supports it."""
+    import torch
+
+    config = _autocast_config()
+    if config is None:
+        return model.predict(texts)
+    device_type, dtype = config
+    with torch.autocast(device_type=device_type, dtype=dtype):
+        return model.predict(texts)
+
+
+BATCH_SIZE = 64
+MAX_TEXT_CHARS = 256  # BERT attention is O(N²); giant merge-commit bodies aren't worth it
+
+
+def predict_length_sorted(model, texts: list[str]) -> dict:
+    """Predict in length-sorted chunks to minimize padding waste.
+
+    model.predict pads every sequence to the longest in the batch, so one
+    512-token merge commit inflates the compute for every one-liner next
+    to it. Sorting by length groups similar sizes per chunk; texts are
+    also truncated to MAX_TEXT_CHARS first. Returns per-axis float32
+    arrays in the original order.
+    """
+    clipped = [t[:MAX_TEXT_CHARS] for t in texts]
+    order = sorted(range(len(clipped)), key=lambda i: len(clipped[i]))
+    scores = {axis: np.zeros(len(clipped), dtype=np.float32) for axis in AXES}
+    for start in range(0, len(order), BATCH_SIZE):
+        idxs = order[start : start + BATCH_SIZE]
+        chunk = predict_autocast(model, [clipped[i] for i in idxs])
+        for axis in AXES:
+            scores[axis][idxs] = np.asarray(chunk[axis], dtype=np.float32)
+    return scores
+
+
+# Cross-run score cache: sha1(text) -> packed float32[6]. The same commit
+# messages re-enter the model every time overlapping users are rescraped;
+# 24 bytes per entry makes caching them all essentially free.
+_TOX_CACHE_FILE = Path("raw_data") / ".toxicity_cache.db"
+_tox_cache = None
+
+
+def _get_tox_cache():
+    global _tox_cache
+    if _tox_cache is None:
+        try:
+            _TOX_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(_TOX_CACHE_FILE, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS tox (hash BLOB PRIMARY KEY, scores BLOB)")
+            _tox_cache = conn
+        except sqlite3.Error as e:
+            print(f"    Toxicity cache unavailable: {e}")
+            _tox_cache = False  # don't retry every call
+    return _tox_cache or None
+
+
+def _predict_deduped(model, texts: list[str]) -> dict:
+    """Score each distinct text once and scatter results back per input.
+
+    Commit messages repeat constantly ("Update README.md", "fix typo",
+    merge commits) — active users are often only 50-70% unique, so this
+    directly cuts BERT inference time. dict.fromkeys keeps first-seen
+    order, unlike np.unique's sort. Distinct texts are further checked
+    against the on-disk cache so only never-seen messages hit the model.
+    """
+    unique = list(dict.fromkeys(texts))
+    hashes = [hashlib.sha1(t.encode()).digest() for t in unique]
+    uniq_mat = np.empty((len(unique), len(AXES)), dtype=np.float32)
+
+    cache = _get_tox_cache()
+    missing = list(range(len(unique)))
+    if cache is not None:
+        missing = []
+        # Chunked IN (...) lookups — SQLite caps bound parameters per query
+        by_hash = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            rows = cache.execute(
+                f"SELECT hash, scores FROM tox WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            by_hash.update(rows)
+        for i, h in enumerate(hashes):
+            blob = by_hash.get(h)
+            if blob is not None and len(blob) == len(AXES) * 4:
+                uniq_mat[i] = np.frombuffer(blob, dtype=np.float32)
+            else:
+                missing.append(i)
+
+    if missing:
+        results = predict_length_sorted(model, [unique[i] for i in missing])
+        miss_mat = np.stack([results[axis] for axis in AXES], axis=1)
+        uniq_mat[missing] = miss_mat
+        if cache is not None:
+            try:
+                cache.executemany(
+                    "INSERT OR REPLACE INTO tox (hash, scores) VALUES (?, ?)",
+                    [(hashes[i], miss_mat[j].tobytes()) for j, i in enumerate(missing)],
+                )
+            except sqlite3.Error as e:
+                print(f"    Toxicity cache write failed: {e}")
+
+    if len(unique) != len(texts):
+        idx_map = {t: i for i, t in enumerate(unique)}
+        back = np.fromiter((idx_map[t] for t in texts), dtype=np.int64, count=len(texts))
+        uniq_mat = uniq_mat[back]
+    return {axis: uniq_mat[:, k] for k, axis in enumerate(AXES)}
 
 
 def get_toxicity_model():
-    """Lazy-load the Detoxify model to avoid startup overhead."""
+    """Lazy-load the Detoxify model to avoid startup overhead.
+
+    On CPU the underlying BERT is INT8-quantized once at load time so every
+    caller (CLI scripts, FastAPI background tasks) shares the fast path.
+    """
     global _detoxify_model
     if _detoxify_model is None:
-        from detoxify import Detoxify
+        with _model_lock:
+            if _detoxify_model is not None:  # another thread loaded it first
+                return _detoxify_model
+            import torch
+            from detoxify import Detoxify
 
-        _detoxify_model = Detoxify("original")
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model = Detoxify("original", device=device)
+            if device == "cpu":
+                model.model = quantize_model(model.model)
+            else:
+                # Fuse the BERT encoder kernels — orthogonal to BF16 autocast.
+                # Falls back to eager mode if the compile backend is unavailable.
+                try:
+                    model.model = torch.compile(
+                        model.model, mode="reduce-overhead", fullgraph=False
+                    )
+                except Exception as e:
+                    print(f"    torch.compile unavailable, running eager: {e}")
+            _detoxify_model = model
     return _detoxify_model
 
 
+# Opt-in eager warm-up: hides the multi-second BERT load + CUDA init behind
+# whatever the process does first (network scrapes, server startup) instead
+# of the first user's request. FastAPI already warm-loads via its lifespan
+# hook; this covers the CLI scripts.
+if os.environ.get("EAGER_DETOXIFY") == "1":
+    threading.Thread(target=get_toxicity_model, daemon=True).start()
+
+
+def analyze_and_find_worst(texts: list[str]) -> tuple[dict, dict | None]:
+    """Run one Detoxify pass and derive both the averaged scores and the
+    worst commit from it.
+
+    analyze_toxicity + find_worst_commit each run a full BERT forward over
+    the same texts; callers that need both (the scraper) should use this
+    instead to halve inference cost. Returns (scores_dict, worst_dict) —
+    worst_dict is None for empty input or all-zero scores.
+    """
+    if not texts:
+        return {axis: 0.0 for axis in AXES}, None
+
+    try:
+        model = get_toxicity_model()
+        results = _predict_deduped(model, texts)
+
+        # (N, 6) matrix: column means give the averages, a single argmax
+        # gives the worst (commit, axis) pair
+        mat = np.stack([results[axis] for axis in AXES], axis=1)
+        scores = {axis: float(mat[:, i].mean()) for i, axis in enumerate(AXES)}
+
+        worst_idx, worst_axis_idx = divmod(int(mat.argmax()), len(AXES))
+        worst_score = float(mat[worst_idx, worst_axis_idx])
+        if worst_score <= 0.0:
+            return scores, None
+
+        worst = {
+            "message": texts[worst_idx],
+            "toxicity_axis": AXES[worst_axis_idx],
+            "toxicity_score": worst_score,
+            "all_scores": {axis: float(mat[worst_idx, i]) for i, axis in enumerate(AXES)},
+        }
+        return scores, worst
+    except Exception as e:
+        print(f"    Toxicity analysis failed: {e}")
+        return {axis: 0.0 for axis in AXES}, None
+
+
 def analyze_toxicity(texts: list[str]) -> dict:
     """
     Analyze toxicity in a list of texts (commit messages).
@@ -40,20 +270,10 @@ def analyze_toxicity(texts: list[str]) -> dict:
 
     try:
         model = get_toxicity_model()
-        results = model.predict(texts)
+        results = _predict_deduped(model, texts)
 
         # Average scores across all texts
-        return {
-            key: float(results[key].mean())
-            for key in [
-                "toxicity",
-                "severe_toxicity",
-                "obscene",
-                "threat",
-                "insult",
-                "identity_attack",
-            ]
-        }
+        return {key: float(results[key].mean()) for key in AXES}
     except Exception as e:
         print(f"    Toxicity analysis failed: {e}")
         return {
@@ -77,30 +297,21 @@ def find_worst_commit(texts: list[str]) -> dict | None:
 
     try:
         model = get_toxicity_model()
-        results = model.predict(texts)
-
-        # Define toxicity axes
-        axes = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
-
-        # Find the worst commit (highest score on any axis)
-        worst_idx = None
-        worst_axis = None
-        worst_score = 0.0
+        results = _predict_deduped(model, texts)
 
-        for idx, text in enumerate(texts):
-            for axis in axes:
-                score = float(results[axis][idx])
-                if score > worst_score:
-                    worst_score = score
-                    worst_idx = idx
-                    worst_axis = axis
+        # Find the worst commit (highest score on any axis) — one C-level
+        # argmax over the (N, 6) matrix instead of 6N Python comparisons
+        mat = np.stack([results[axis] for axis in AXES], axis=1)
+        worst_idx, axis_idx = np.unravel_index(mat.argmax(), mat.shape)
+        worst_axis = AXES[axis_idx]
+        worst_score = float(mat[worst_idx, axis_idx])
 
-        if worst_idx is None:
+        if worst_score <= 0.0:
             return None
 
         # Get all scores for the worst commit
         worst_text = texts[worst_idx]
-        all_scores = {axis: float(results[axis][worst_idx]) for axis in axes}
+        all_scores = {axis: float(results[axis][worst_idx]) for axis in AXES}
 
         return {
             "message": worst_text,
@@ -128,4 +339,7 @@ def save_worst_commit(username: str, worst_commit: dict) -> None:
     user_dir.mkdir(parents=True, exist_ok=True)
 
     worst_file = user_dir / "worst_commit.json"
-    worst_file.write_text(json.dumps(worst_commit, indent=2))
+    if orjson:
+        worst_file.write_bytes(orjson.dumps(worst_commit))
+    else:
+        worst_file.write_text(json.dumps(worst_commit, separators=(",", ":")))
@@ -10,8 +10,7 @@ checks = [
     ("Directory creation", 'user_dir.mkdir(parents=True, exist_ok=True)'),
     ("Save commits.json", 'commits_file = user_dir / "commits.json"'),
     ("Save readmes.json", 'readmes_file = user_dir / "readmes.json"'),
-    ("Capture repo name", 'repo_name = repo.get("name", "unknown")'),
-    ("Store in readme_dict", 'readme_dict[repo_name] = readme_content'),
+    ("Store in readme_dict", 'readme_dict[repo.get("name", "unknown")] = readme_content'),
     ("Call save_raw_data", 'save_raw_data(username, commit_messages, readme_dict)'),
 ]
 